@@ -0,0 +1,139 @@
+from dotenv import dotenv_values
+import threading
+import difflib
+import json
+import time
+import os
+
+from Backend.Cache import PersistentTTLCache
+from Backend.IntentClassifier import normalize_query
+
+env_vars = dotenv_values(".env")
+
+INDEX_PATH = os.path.join("Data", "AppIndex.json")
+REFRESH_SECONDS = float(env_vars.get("AppIndexRefreshHours", 24)) * 3600
+WEB_TTL = float(env_vars.get("AppWebCacheDays", 7)) * 24 * 3600
+# A miss triggers a rescan at most this often, in case the app was just installed
+MISS_REFRESH_SECONDS = 5 * 60
+
+
+def installed_app_names() -> list:
+    """Names of the installed apps as AppOpener knows them."""
+    from AppOpener import give_appnames
+    return list(give_appnames())
+
+
+class AppIndex:
+    """Maps spoken app and site names to launch targets.
+
+    Installed apps come from AppOpener's app list, which is scanned once,
+    saved to Data/AppIndex.json and refreshed in the background when it gets
+    old or a name is not found. Sites found through the web fallback are
+    remembered with a TTL. Lookups are in-memory dictionary hits; fuzzy
+    matches are computed once per spoken name and then memoized.
+    """
+
+    def __init__(self, path=INDEX_PATH, scan=installed_app_names):
+        self.path = path
+        self.scan = scan
+        self.apps = {}  # normalized name -> AppOpener name
+        self.built = 0.0
+        self.web = PersistentTTLCache(os.path.join(os.path.dirname(path), "AppWebCache.json"),
+                                      max_entries=500, default_ttl=WEB_TTL)
+        self._resolved = {}  # spoken name -> AppOpener name or None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._last_miss_refresh = 0.0
+        self._load()
+        if time.time() - self.built > REFRESH_SECONDS:
+            self.refresh_in_background()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                stored = json.load(file)
+            self.apps, self.built = stored["apps"], stored["built"]
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+
+    def refresh(self) -> None:
+        """Rescan installed apps and merge the changes into the index."""
+        names = self.scan()
+        apps = {normalize_query(name): name for name in names if normalize_query(name)}
+        with self._lock:
+            added = apps.keys() - self.apps.keys()
+            removed = self.apps.keys() - apps.keys()
+            self.apps, self.built = apps, time.time()
+            if added or removed:
+                # Only memoized answers that could have changed are dropped
+                self._resolved = {spoken: name for spoken, name in self._resolved.items()
+                                  if name is not None and normalize_query(name) not in removed}
+        try:
+            with open(self.path + ".tmp", "w", encoding="utf-8") as file:
+                json.dump({"apps": apps, "built": self.built}, file)
+            os.replace(self.path + ".tmp", self.path)
+        except Exception as e:
+            print(f"Error saving app index: {e}")
+
+    def refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error scanning installed apps: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="AppIndexRefresh", daemon=True).start()
+
+    def resolve_app(self, spoken: str):
+        """Return the AppOpener name for a spoken app name, or None."""
+        key = normalize_query(spoken)
+        with self._lock:
+            if key in self._resolved:
+                return self._resolved[key]
+            name = self._match(key)
+            # Misses are not memoized once the index is empty, so a first scan can still fill them
+            if name is not None or self.apps:
+                self._resolved[key] = name
+
+        if name is None and self.apps and time.time() - self._last_miss_refresh > MISS_REFRESH_SECONDS:
+            self._last_miss_refresh = time.time()
+            self.refresh_in_background()
+        return name
+
+    def _match(self, key: str):
+        if key in self.apps:
+            return self.apps[key]
+        # "chrome" -> "google chrome": the spoken words are all part of an app's name
+        words = set(key.split())
+        containing = [name for name in self.apps if words and words <= set(name.split())]
+        if containing:
+            return self.apps[min(containing, key=len)]
+        close = difflib.get_close_matches(key, self.apps.keys(), n=1, cutoff=0.8)
+        return self.apps[close[0]] if close else None
+
+    def resolve_web(self, spoken: str):
+        """Return the remembered site for a spoken name, or None."""
+        return self.web.get(normalize_query(spoken))
+
+    def remember_web(self, spoken: str, url: str) -> None:
+        self.web.put(normalize_query(spoken), url)
+
+
+_app_index = None
+_app_index_lock = threading.Lock()
+
+
+def get_app_index() -> AppIndex:
+    """Return the process-wide app index."""
+    global _app_index
+    with _app_index_lock:
+        if _app_index is None:
+            _app_index = AppIndex()
+        return _app_index
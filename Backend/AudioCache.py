@@ -0,0 +1,80 @@
+import threading
+import hashlib
+import edge_tts
+import os
+
+
+class AudioCache:
+    """Disk cache of synthesized speech keyed by (text, voice, pitch, rate).
+
+    Files are named after the hash of their key, written atomically and
+    evicted least-recently-used first (by modification time, which is bumped
+    on every hit) once the directory grows past max_bytes.
+    """
+
+    def __init__(self, directory=os.path.join("Data", "AudioCache"), max_bytes=200 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # Partial downloads left behind by a crash
+        for entry in os.scandir(directory):
+            if entry.name.endswith(".tmp"):
+                os.remove(entry.path)
+        self._total_bytes = sum(entry.stat().st_size for entry in os.scandir(directory)
+                                if entry.name.endswith(".mp3"))
+
+    def path_for(self, text: str, voice: str, pitch: str, rate: str) -> str:
+        key = hashlib.sha256("\0".join((voice, pitch, rate, text)).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def get(self, text: str, voice: str, pitch: str, rate: str):
+        """Return the cached file path or None."""
+        path = self.path_for(text, voice, pitch, rate)
+        try:
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            return None
+
+    async def synthesize(self, text: str, voice: str, pitch: str, rate: str) -> str:
+        """Return the path of the audio for text, synthesizing it with edge-tts on a miss."""
+        path = self.get(text, voice, pitch, rate)
+        if path:
+            return path
+
+        path = self.path_for(text, voice, pitch, rate)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        communicate = edge_tts.Communicate(text=text, voice=voice, pitch=pitch, rate=rate)
+        try:
+            await communicate.save(temp_path)
+            if not os.path.getsize(temp_path):
+                raise ValueError(f"No audio received for {text!r}")
+            os.replace(temp_path, path)
+        except BaseException:
+            # Temp files are not counted or evicted, so a failed download must not leave one behind
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        with self._lock:
+            self._total_bytes += os.path.getsize(path)
+            if self._total_bytes > self.max_bytes:
+                self._evict(keep=path)
+        return path
+
+    def _evict(self, keep: str) -> None:
+        entries = sorted((entry for entry in os.scandir(self.directory) if entry.name.endswith(".mp3")),
+                         key=lambda entry: entry.stat().st_mtime)
+        self._total_bytes = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            if entry.path == keep:
+                continue
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self._total_bytes -= size
+            except OSError:
+                pass  # Still being played or already gone
@@ -3,18 +3,25 @@ from webbrowser import open as webopen
 
 from pywhatkit import search, playonyt
 from dotenv import dotenv_values
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from rich import print
-from groq import Groq
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from typing import NamedTuple
 import webbrowser
+import threading
+import time
 import subprocess
-import requests
 import keyboard
 import asyncio
 import os
 
 from Backend.Chatbox import messages, SYSTEM_CHATBOX
 from Backend.TextToSpeech import responses
+from Backend.Providers import get_groq, get_http_session
+from Backend.AppIndex import get_app_index
+from Backend.Tokens import recent_messages
+from Backend.Tracing import tracer
 
 env_vars = dotenv_values(".env")
 GROQ_API_KEY = env_vars.get("GROQ_API_KEY")
@@ -24,14 +31,21 @@ classes = ["zCubwf", "hgKElc", "LTKOO sY7ric", "ZOLCW", "gsrt vk_bk FzvWSb YwPhn
             "LWkfKe", "VQF4g", "qv3Wpe", "kno-rdesc", "SPZz6b"]
 
 useragent = "Mozilla/5.0 (Windows NT 10.1; Win64 ; x64) AppleWebKit/537.36 (KHTML, like Geko) Chrome/100.0.4896.75 Safari/537.36"
-client = Groq(api_key=GROQ_API_KEY)
+client = get_groq()
 
 professional_responses = [
     "Your satisfaction is my top priority; feel free to reach out if there's anything else I can help you with.",
     "I am at your service for any additional questions or support you may need, don't hesitate to ask.",
 ]
 
-messages = []
+# Earlier requests and drafts, so "make it shorter" works; bounded by ContentHistoryTokens when sent
+messages = deque(maxlen=20)
+ContentHistoryTokens = int(env_vars.get("ContentHistoryTokens", 1500))
+
+# Editors that reload changed files can be opened on the first chunk; classic Notepad
+# reads the file only once, so with it the file is opened when writing has finished
+ContentEditor = env_vars.get("ContentEditor", "notepad.exe")
+ContentOpenEarly = env_vars.get("ContentOpenEarly", str(ContentEditor.lower() != "notepad.exe")) == "True"
 
 SYSTEM_CHATBOX = [{"role": "system", "content": f"Hello, I am {os.environ['Username']}, You're a content writer. You have to write content like letter"}]
 
@@ -41,15 +55,15 @@ def GoogleSearch(Topic):
 
 def content(Topic):
     def OpenNotepad(File):
-        default_text_editor = "notepad.exe"
-        subprocess.Popen([default_text_editor, File])
+        subprocess.Popen([ContentEditor, File])
 
-    def ContentWriterAI(prompt):
+    def ContentWriterAI(prompt, File):
         messages.append({"role": "user", "content": f"{prompt}"})
 
         completion = client.chat.completions.create(
             model="mixtral-8x7b-32768",
-            messages=SYSTEM_CHATBOX + messages,
+            # Only as much of the earlier writing as fits the budget is sent again
+            messages=SYSTEM_CHATBOX + recent_messages(messages, ContentHistoryTokens),
             max_tokens=2048,
             temperature=0.7,
             top_p=1,
@@ -57,24 +71,30 @@ def content(Topic):
             stop=None
         )
         answer = ""
-
-        for chunk in completion:
-            if chunk.choices[0].delta.content:
-                answer += chunk.choices[0].delta.content
-
-        # Clean response and save to chat log
-        answer = answer.replace("<\\s>", "")
-        messages.append({"role": "system", "content": answer})
-        return answer
+        opened = False
+
+        # Chunks go to the file as they arrive
+        with open(File, "w", encoding="utf-8") as file:
+            for chunk in completion:
+                text = chunk.choices[0].delta.content
+                if text:
+                    text = text.replace("</s>", "")
+                    answer += text
+                    file.write(text)
+                    file.flush()
+                    if ContentOpenEarly and not opened:
+                        OpenNotepad(File)
+                        opened = True
+
+        messages.append({"role": "assistant", "content": answer})
+        return opened
 
     Topic = Topic.replace("Content", " ")
-    ContentByAI = ContentWriterAI(Topic)
+    os.makedirs("Data", exist_ok=True)
+    File = os.path.join("Data", f"{Topic.lower().replace(' ', '')}.txt")
 
-    with open(rf"C:\Users\himan\Desktop\Friday\Backend\Data{Topic.lower().replace(' ','')}.txt", "w", encoding="utf-8") as file:
-        file.write(ContentByAI)
-        file.close()
-
-    OpenNotepad(rf"C:\Users\himan\Desktop\Friday\Backend\Data{Topic.lower().replace(' ','')}.txt")
+    if not ContentWriterAI(Topic, File):
+        OpenNotepad(File)
     return True
 
 def YoutubeSearch(Topic):
@@ -86,15 +106,39 @@ def PlayYoutTube(query):
     playonyt(query)
     return True
 
-def OpenApp(app, sess=requests.session()):
+# Only the result links of a Google results page are parsed
+result_links = SoupStrainer("a", attrs={'jsname': 'UWckNb'})
+
+# lxml is optional; it parses much faster than the pure-Python parser
+try:
+    import lxml
+    html_parser = "lxml"
+except ImportError:
+    html_parser = "html.parser"
+
+def OpenApp(app, sess=get_http_session()):
+    app_index = get_app_index()
+    name = app_index.resolve_app(app)
+    # Sites found by an earlier web fallback open straight away, unless an app of that name was installed since
+    url = None if name else app_index.resolve_web(app)
+    if url:
+        webopen(url)
+        return True
+
     try:
-        appopen(app, match_closest=True, output=True, throw_error=True)
+        if name:
+            appopen(name, output=True, throw_error=True)
+        elif not app_index.apps:
+            # The index has not been built yet; let AppOpener search itself
+            appopen(app, match_closest=True, output=True, throw_error=True)
+        else:
+            raise LookupError(app)
         return True
     except:
         def extract_links(html):
             if html is None:
                 return []
-            soup = BeautifulSoup(html, "html.parser")
+            soup = BeautifulSoup(html, html_parser, parse_only=result_links)
             links = soup.find_all("a", {'jsname': 'UWckNb'})
             return [link.get('href') for link in links]
 
@@ -110,9 +154,10 @@ def OpenApp(app, sess=requests.session()):
             return None
         html = search_google(app)
 
-        if html:
-            links = extract_links(html)[0]
-            webopen(links)
+        links = extract_links(html)
+        if links:
+            app_index.remember_web(app, links[0])
+            webopen(links[0])
         return True
 
 def CloseApp(app):
@@ -120,7 +165,7 @@ def CloseApp(app):
         pass
     else:
         try:
-            close(app, match_closest=True, output=True, throw_error=True)
+            close(get_app_index().resolve_app(app) or app, match_closest=True, output=True, throw_error=True)
             return True
         except:
             return False
@@ -138,6 +183,8 @@ def system(command):
     def volume_down():
         keyboard.press_and_release("volume down")
 
+    # Decisions say "volume up", older prompts produced "volume_up"
+    command = command.strip().lower().replace(" ", "_")
     if command == "mute":
         mute()
     elif command == "unmute":
@@ -148,53 +195,110 @@ def system(command):
         volume_down()
     return True
 
-async def TranslateAndExecute(commands: list[str]):
-    funcs = []
-    for command in commands:
-        if command.startswith("open"):
-            if "open" in command:
-                pass
-            if "open file" == command:
-                pass
-            else:
-                fun = asyncio.to_thread(OpenApp, command.removeprefix("open "))
-                funcs.append(fun)
-
-        elif command.startswith("general "):
-            pass
-
-        elif command.startswith("realtime "):
-            pass
-
-        elif command.startswith("close "):
-            fun = asyncio.to_thread(CloseApp, command.removeprefix("close "))
-            funcs.append(fun)
-
-        elif command.startswith("play "):
-            fun = asyncio.to_thread(PlayYoutTube, command.removeprefix("play "))
-            funcs.append(fun)
-
-        elif command.startswith("content "):
-            fun = asyncio.to_thread(content, command.removeprefix("content "))
-            funcs.append(fun)
+# Command prefixes in the order they are tried, with the function that runs them
+COMMANDS = [
+    ("open ", OpenApp),
+    ("close ", CloseApp),
+    ("play ", PlayYoutTube),
+    ("content ", content),
+    ("google search ", GoogleSearch),
+    ("youtube search ", YoutubeSearch),
+    ("system ", system),
+]
 
-        elif command.startswith("google search "):
-            fun = asyncio.to_thread(GoogleSearch, command.removeprefix("google search "))
-            funcs.append(fun)
+# Seconds a command may run before the turn stops waiting for it
+COMMAND_TIMEOUTS = {
+    "open ": 10,
+    "close ": 5,
+    "play ": 15,
+    "content ": 60,
+    "google search ": 10,
+    "youtube search ": 10,
+    "system ": 3,
+}
+
+# Automation calls block (AppOpener, pywhatkit, keyboard), so they get their own
+# threads instead of competing with everything else on the default executor
+executor = ThreadPoolExecutor(max_workers=int(env_vars.get("AutomationWorkers", 4)),
+                              thread_name_prefix="Automation")
+
+
+class CommandResult(NamedTuple):
+    command: str
+    status: str  # "done", "failed" or "timeout"
+    result: object
+    seconds: float
+
+
+class LatencyStats:
+    """Per command kind latency samples and outcome counters."""
+
+    def __init__(self, window=200):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, seconds: float, status: str) -> None:
+        with self._lock:
+            self._samples.setdefault(kind, deque(maxlen=self.window)).append(seconds)
+            counts = self._counts.setdefault(kind, {"done": 0, "failed": 0, "timeout": 0})
+            counts[status] += 1
+
+    def summary(self) -> dict:
+        """{kind: {count, p50, p95, max, done, failed, timeout}} with times in seconds."""
+        with self._lock:
+            result = {}
+            for kind, samples in self._samples.items():
+                ordered = sorted(samples)
+                result[kind] = dict(self._counts[kind], count=len(ordered),
+                                    p50=ordered[len(ordered) // 2],
+                                    p95=ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                                    max=ordered[-1])
+            return result
+
+
+stats = LatencyStats()
+
+
+async def RunCommand(command, prefix, function):
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    future = loop.run_in_executor(executor, function, command.removeprefix(prefix))
+    try:
+        async with tracer.async_span(command, cat="automation"):
+            result = await asyncio.wait_for(future, timeout=COMMAND_TIMEOUTS[prefix])
+        status = "done"
+    except asyncio.TimeoutError:
+        # A queued call is dropped; one already running finishes in the background
+        result, status = None, "timeout"
+    except Exception as e:
+        print(f"Error running {command}: {e}")
+        result, status = e, "failed"
+    seconds = time.perf_counter() - started
+    stats.record(prefix.strip(), seconds, status)
+    return CommandResult(command, status, result, seconds)
 
-        elif command.startswith("system "):
-            fun = asyncio.to_thread(system, command.removeprefix("system "))
-            funcs.append(fun)
 
-        else:
+async def TranslateAndExecute(commands: list[str]):
+    """Run the commands concurrently and yield a CommandResult for each as soon as it finishes."""
+    tasks = []
+    for command in commands:
+        if command in ("open file", "open") or command.startswith(("general ", "realtime ")):
+            continue
+        match = next(((prefix, function) for prefix, function in COMMANDS if command.startswith(prefix)), None)
+        if match is None:
             print(f"No Function Found For: {command}")
+            continue
+        tasks.append(asyncio.ensure_future(RunCommand(command, *match)))
 
-    results = await asyncio.gather(*funcs)
-    for result in results:
-        if isinstance(result, str):
-            yield result
-        else:
-            yield result
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # The caller stopped listening (or its own deadline hit); stop waiting on the rest
+        for task in tasks:
+            task.cancel()
 
 async def Automation(commands: list[str]):
     async for result in TranslateAndExecute(commands):
@@ -0,0 +1,71 @@
+from contextlib import contextmanager
+import importlib
+import threading
+import time
+import sys
+
+
+class BootProfiler:
+    """Timings of module imports and subsystem initialization during startup.
+
+    Spans are always recorded (they cost a perf_counter call each); the report
+    is only printed when the assistant is started with --boot-profile.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.spans = []  # (kind, name, thread, start offset, seconds)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, kind="init"):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.spans.append((kind, name, threading.current_thread().name,
+                                   started - self.started, time.perf_counter() - started))
+
+    def import_module(self, name: str):
+        """Import a module and record how long it took, including its own imports."""
+        already_loaded = name in sys.modules
+        with self.span(name, kind="import"):
+            module = importlib.import_module(name)
+        if already_loaded:
+            # Already imported by something measured earlier; the span only covers the lookup
+            with self._lock:
+                self.spans[-1] = self.spans[-1][:1] + (f"{name} (cached)",) + self.spans[-1][2:]
+        return module
+
+    def mark(self, name: str) -> None:
+        """Record a point in time, e.g. the window becoming visible."""
+        with self._lock:
+            self.spans.append(("mark", name, threading.current_thread().name,
+                               time.perf_counter() - self.started, 0.0))
+
+    def run_in_background(self, name: str, function, *args) -> threading.Thread:
+        """Run an initialization step on its own thread, timed as one span."""
+        def run():
+            with self.span(name):
+                try:
+                    function(*args)
+                except Exception as e:
+                    print(f"Error initializing {name}: {e}")
+
+        thread = threading.Thread(target=run, name=name, daemon=True)
+        thread.start()
+        return thread
+
+    def report(self) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span[3])
+        print(f"{'kind':<7}{'subsystem':<40}{'thread':<22}{'start ms':>10}{'took ms':>10}")
+        for kind, name, thread, offset, seconds in spans:
+            print(f"{kind:<7}{name:<40.40}{thread:<22.22}{offset * 1000:>10.1f}{seconds * 1000:>10.1f}")
+
+
+profiler = BootProfiler(enabled="--boot-profile" in sys.argv)
@@ -0,0 +1,129 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+import threading
+import atexit
+import json
+import time
+import os
+
+
+class PersistentTTLCache:
+    """LRU cache with per-entry TTLs that survives restarts.
+
+    Entries live in memory and are written to a JSON file shortly after they
+    change (and at exit), using an atomic replace so a crash never leaves a
+    half-written cache behind. Values must be JSON serializable.
+    """
+
+    def __init__(self, path, max_entries=1000, default_ttl=3600.0, save_delay=2.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.save_delay = save_delay
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self._save_timer = None
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+        self._load()
+        atexit.register(self.save)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                stored = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return
+        now = time.time()
+        for key, value, expires_at in stored:
+            if expires_at > now:
+                self._entries[key] = (value, expires_at)
+
+    def get(self, key):
+        """Return the cached value, or None on a miss or an expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def put(self, key, value, ttl=None) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time() + (self.default_ttl if ttl is None else ttl))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+            self._schedule_save()
+
+    def discard(self, key) -> None:
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._schedule_save()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return dict(self._stats, size=len(self._entries),
+                        hit_rate=self._stats["hits"] / lookups if lookups else 0.0)
+
+    def _schedule_save(self) -> None:
+        # Coalesce bursts of puts into a single write
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def save(self) -> None:
+        with self._lock:
+            self._save_timer = None
+            now = time.time()
+            stored = [[key, value, expires_at] for key, (value, expires_at) in self._entries.items()
+                      if expires_at > now]
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".tmp", "w", encoding="utf-8") as file:
+                json.dump(stored, file)
+            os.replace(self.path + ".tmp", self.path)
+        except Exception as e:
+            print(f"Error saving cache {self.path}: {e}")
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one execution.
+
+    The first caller runs the function; callers arriving while it is still
+    running wait for and share its result (or exception).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key, function):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(function())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return future.result()
@@ -0,0 +1,278 @@
+from collections import deque
+from dotenv import dotenv_values
+import threading
+import hashlib
+import atexit
+import queue
+import json
+import gzip
+import os
+
+env_vars = dotenv_values(".env")
+
+CHAT_LOG_DIRECTORY = os.path.join("Data", "ChatLog")
+LEGACY_CHAT_LOG_PATH = os.path.join("Data", "ChatLog.json")
+SEGMENT_BYTES = int(env_vars.get("ChatLogSegmentKB", 1024)) * 1024
+TAIL_SIZE = int(env_vars.get("ChatLogTailSize", 200))
+
+
+def _segment_name(first_seq: int) -> str:
+    return f"segment-{first_seq:010d}.jsonl"
+
+
+def _segment_first_seq(filename: str) -> int:
+    return int(filename.split("-")[1].split(".")[0])
+
+
+class ChatStore:
+    """Append-only conversation store.
+
+    Turns are journaled as JSON lines into size-rotated segment files named
+    after the sequence number of their first turn. Cold segments are gzipped,
+    the most recent turns stay cached in memory and a single writer thread owns
+    the active segment, so appending a turn never depends on history length.
+    """
+
+    def __init__(self, directory=CHAT_LOG_DIRECTORY, legacy_path=LEGACY_CHAT_LOG_PATH,
+                 segment_bytes=SEGMENT_BYTES, tail_size=TAIL_SIZE):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._tail = deque(maxlen=tail_size)
+        self._segments = []  # [(first_seq, path)] ordered by first_seq
+        self._count = 0
+        self._queue = queue.Queue()
+        self._listeners = []
+        self._fingerprint = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+        if self._count == 0 and legacy_path:
+            self._migrate(legacy_path)
+        self._fill_tail()
+
+        self._journaled = self._count
+        self._active = open(self._segments[-1][1], "a", encoding="utf-8")
+        self._writer = threading.Thread(target=self._run, name="ChatStoreWriter", daemon=True)
+        self._writer.start()
+
+    # Recovery
+
+    def _recover(self) -> None:
+        """Rebuild the segment index and cut off a torn last write."""
+        names = sorted(os.listdir(self.directory))
+        for name in names:
+            if name.endswith(".tmp"):
+                os.remove(os.path.join(self.directory, name))
+            elif name.endswith(".jsonl") and name + ".gz" in names:
+                # Crashed after compressing but before removing the original
+                os.remove(os.path.join(self.directory, name))
+
+        for name in sorted(os.listdir(self.directory)):
+            if name.startswith("segment-") and name.endswith((".jsonl", ".jsonl.gz")):
+                self._segments.append((_segment_first_seq(name), os.path.join(self.directory, name)))
+
+        if not self._segments or self._segments[-1][1].endswith(".gz"):
+            first_seq = self._segment_end(len(self._segments) - 1) if self._segments else 0
+            path = os.path.join(self.directory, _segment_name(first_seq))
+            open(path, "a", encoding="utf-8").close()
+            self._segments.append((first_seq, path))
+
+        # Only the active segment can hold a partially written line
+        first_seq, path = self._segments[-1]
+        valid_bytes = 0
+        records = 0
+        with open(path, "rb") as file:
+            for line in file:
+                try:
+                    json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                valid_bytes += len(line)
+                records += 1
+        if valid_bytes != os.path.getsize(path):
+            print(f"Recovering chat log: truncating {path} after {records} turns")
+            with open(path, "r+b") as file:
+                file.truncate(valid_bytes)
+
+        self._count = first_seq + records
+
+    def _segment_end(self, index: int) -> int:
+        """Return one past the last sequence number stored in a cold segment."""
+        if index + 1 < len(self._segments):
+            return self._segments[index + 1][0]
+        first_seq, path = self._segments[index]
+        return first_seq + len(self._read_segment(path))
+
+    def _migrate(self, legacy_path: str) -> None:
+        """Import the old whole-file ChatLog.json once."""
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as file:
+                legacy_messages = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return
+
+        with open(self._segments[-1][1], "a", encoding="utf-8") as file:
+            for message in legacy_messages:
+                file.write(json.dumps({"role": message["role"], "content": message["content"]}) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        self._count = len(legacy_messages)
+
+    def _fill_tail(self) -> None:
+        start = max(0, self._count - self._tail.maxlen)
+        self._tail.extend(self._read_from_segments(start, self._count))
+
+    # Reading
+
+    @staticmethod
+    def _read_segment(path: str) -> list:
+        if not os.path.exists(path) and os.path.exists(path + ".gz"):
+            path += ".gz"  # Compressed by the writer thread in the meantime
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+    def _read_from_segments(self, start: int, stop: int) -> list:
+        with self._lock:
+            segments = list(self._segments)
+            count = self._count
+        result = []
+        for index, (first_seq, path) in enumerate(segments):
+            end = segments[index + 1][0] if index + 1 < len(segments) else count
+            if end <= start or first_seq >= stop:
+                continue
+            records = self._read_segment(path)
+            result.extend(records[max(start, first_seq) - first_seq:min(stop, end) - first_seq])
+        return result
+
+    def __len__(self) -> int:
+        return self._count
+
+    def tail(self, n=None) -> list:
+        """Return the last n turns (all cached turns by default) from memory."""
+        with self._lock:
+            messages = list(self._tail)
+        if n is not None:
+            messages = messages[-n:] if n > 0 else []
+        return [dict(message) for message in messages]
+
+    def snapshot(self) -> tuple:
+        """Return (count, cached turns) taken together, so the last cached turn is always turn count - 1."""
+        with self._lock:
+            return self._count, [dict(message) for message in self._tail]
+
+    def fingerprint(self) -> str:
+        """Identify this conversation for caches derived from it.
+
+        Appending turns keeps the fingerprint; a chat log that was reset gets
+        a different one once its first turn is written.
+        """
+        if self._fingerprint is None and len(self):
+            first = self.read_range(0, 1)[0]
+            name = os.path.basename(self._segments[0][1]).replace(".gz", "")
+            self._fingerprint = f"{name}:{hashlib.sha1(json.dumps(first).encode('utf-8')).hexdigest()}"
+        return self._fingerprint or ""
+
+    def read_range(self, start: int, stop: int) -> list:
+        """Return turns [start, stop), paging cold segments in from disk when needed."""
+        with self._lock:
+            start, stop = max(0, start), min(stop, self._count)
+            tail_start = self._count - len(self._tail)
+            if start >= tail_start:
+                return [dict(message) for message in list(self._tail)[start - tail_start:stop - tail_start]]
+        self.flush()
+        return self._read_from_segments(start, stop)
+
+    def history(self) -> list:
+        """Return the whole conversation. This is O(history); prefer tail()."""
+        return self.read_range(0, len(self))
+
+    # Writing
+
+    def append(self, role: str, content: str) -> int:
+        """Record a turn and return its sequence number. The disk write happens on the writer thread."""
+        return self._append_records([{"role": role, "content": content}])
+
+    def append_exchange(self, question: str, answer: str) -> tuple:
+        """Record a question and its answer as consecutive turns and return both sequence numbers."""
+        seq = self._append_records([{"role": "user", "content": question}, {"role": "assistant", "content": answer}])
+        return seq, seq + 1
+
+    def _append_records(self, records: list) -> int:
+        with self._lock:
+            seq = self._count
+            self._count += len(records)
+            for record in records:
+                self._tail.append(record)
+                self._queue.put(record)
+            listeners = list(self._listeners)
+        for offset, record in enumerate(records):
+            for listener in listeners:
+                try:
+                    listener(seq + offset, dict(record))
+                except Exception as e:
+                    print(f"Error in chat store listener: {e}")
+        return seq
+
+    def add_listener(self, callback) -> None:
+        """Call callback(seq, turn) after every append, on the appending thread."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def flush(self) -> None:
+        """Block until every appended turn has reached the journal."""
+        self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._active.write("".join(json.dumps(record) + "\n" for record in batch))
+                self._active.flush()
+                os.fsync(self._active.fileno())
+                self._journaled += len(batch)
+                if self._active.tell() >= self.segment_bytes:
+                    self._rotate()
+            except Exception as e:
+                print(f"Error writing chat log: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _rotate(self) -> None:
+        """Start a new active segment and compress the one that just filled up."""
+        cold_first_seq, cold_path = self._segments[-1]
+        path = os.path.join(self.directory, _segment_name(self._journaled))
+        self._active.close()
+        self._active = open(path, "a", encoding="utf-8")
+        with self._lock:
+            self._segments.append((self._journaled, path))
+
+        with open(cold_path, "rb") as source, gzip.open(cold_path + ".gz.tmp", "wb") as target:
+            target.write(source.read())
+        os.replace(cold_path + ".gz.tmp", cold_path + ".gz")
+        with self._lock:
+            self._segments[-2] = (cold_first_seq, cold_path + ".gz")
+        os.remove(cold_path)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_chat_store() -> ChatStore:
+    """Return the process-wide chat store, opening it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ChatStore()
+            atexit.register(_store.flush)
+        return _store
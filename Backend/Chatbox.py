@@ -1,5 +1,3 @@
-from groq import Groq
-from json import load, dump
 import datetime
 from dotenv import load_dotenv
 import os
@@ -7,6 +5,12 @@ import sys
 import textwrap
 import re
 
+from Backend.ChatStore import get_chat_store
+from Backend.ContextBuilder import get_context_builder
+from Backend.Memory import get_memory_index
+from Backend.Providers import get_groq
+from Backend.Tracing import tracer
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -29,16 +33,11 @@ except Exception as e:
 
 # Initialize Groq client with error handling
 try:
-    client = Groq(api_key=GROQ_API_KEY)
+    client = get_groq()
 except Exception as e:
     print(f"Error initializing Groq client: {e}")
     sys.exit(1)
 
-CHAT_LOG_PATH = os.path.join("Data", "ChatLog.json")
-
-# Ensure Data directory exists
-os.makedirs(os.path.dirname(CHAT_LOG_PATH), exist_ok=True)
-
 # Initialize messages list
 messages = []
 
@@ -138,86 +137,89 @@ def modify_answer(answer):
     separator = "-" * 70
     return f"\n{separator}\n{formatted_text}\n{separator}\n"
 
-def load_chat_log():
-    try:
-        with open(CHAT_LOG_PATH, 'r') as f:
-            return load(f)
-    except FileNotFoundError:
-        with open(CHAT_LOG_PATH, 'w') as f:
-            dump([], f)
-        return []
-    except Exception as e:
-        print(f"Error loading chat log: {e}")
-        return []
-
-def save_chat_log(messages):
-    try:
-        with open(CHAT_LOG_PATH, 'w') as f:
-            dump(messages, f, indent=4)
-    except Exception as e:
-        print(f"Error saving chat log: {e}")
+def chatbot(query, on_token=None, record=True, cancelled=None, on_stored=None):
+    """Sends user query to chatbot and returns AI response.
 
-def chatbot(query):
-    """Sends user query to chatbot and returns AI response"""
+    on_token, if given, is called with every streamed chunk as it arrives, and
+    on_stored with the chat store seqs of the question and the answer once both are stored.
+    The question is stored together with its answer (or error reply), so the
+    store always holds pairs. With record=False nothing is stored (used for
+    speculative answers). Setting the cancelled event ends the stream early,
+    and a cancelled exchange is not stored either.
+    """
     global messages  # Use the global messages variable
-    messages = load_chat_log()
+    chat_store = get_chat_store()
 
-    # Append the user's query
-    messages.append({"role": "user", "content": query})
+    # The query is sent as the newest turn but stored only once it has an answer
+    seq, pending = len(chat_store), {"role": "user", "content": query}
+    # As many recent turns as fit the token budget, plus older ones relevant to the query; the rest are summarized
+    memories = get_memory_index().recall(query, before=seq)
+    messages = get_context_builder().build(SYSTEM_CHATBOX, time_info=get_realtime_information(),
+                                           memories=memories, pending=pending)
 
     try:
         # Create chat completion
-        completion = client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "system", "content": get_realtime_information()}
-            ] + messages[-10:],  # Keep last 10 messages for context
-            max_tokens=1024,
-            temperature=0.7,
-            top_p=1,
-            stream=True,
-            stop=None
-        )
-
-        # Process the streaming response
-        answer = ""
-        current_line = []
-
-        for chunk in completion:
-            if chunk.choices[0].delta.content:
-                content = chunk.choices[0].delta.content
-                current_line.append(content)
-
-                if any(char in content for char in ['.', '!', '?', '\n']):
-                    line = ''.join(current_line)
-                    print(line, end='', flush=True)
-                    answer += line
-                    current_line = []
-
-                elif len(current_line) > 5:
-                    line = ''.join(current_line)
-                    print(line, end='', flush=True)
-                    answer += line
-                    current_line = []
-
-        if current_line:
-            last_line = ''.join(current_line)
-            print(last_line, flush=True)
-            answer += last_line
+        with tracer.span("groq stream"):
+            completion = client.chat.completions.create(
+                model="llama3-70b-8192",
+                messages=messages,
+                max_tokens=1024,
+                temperature=0.7,
+                top_p=1,
+                stream=True,
+                stop=None
+            )
+
+            # Process the streaming response
+            answer = ""
+            current_line = []
+
+            for chunk in completion:
+                if cancelled is not None and cancelled.is_set():
+                    # Closing the response ends generation and frees the pooled connection
+                    getattr(completion, "close", lambda: None)()
+                    break
+                if chunk.choices[0].delta.content:
+                    content = chunk.choices[0].delta.content
+                    if not answer and not current_line:
+                        tracer.instant("first token")
+                    current_line.append(content)
+                    if on_token:
+                        on_token(content)
+
+                    if any(char in content for char in ['.', '!', '?', '\n']):
+                        line = ''.join(current_line)
+                        print(line, end='', flush=True)
+                        answer += line
+                        current_line = []
+
+                    elif len(current_line) > 5:
+                        line = ''.join(current_line)
+                        print(line, end='', flush=True)
+                        answer += line
+                        current_line = []
+
+            if current_line:
+                last_line = ''.join(current_line)
+                print(last_line, flush=True)
+                answer += last_line
 
         answer = modify_answer(answer)
 
-        messages.append({"role": "assistant", "content": answer})
-        save_chat_log(messages)
+        if record and not (cancelled is not None and cancelled.is_set()):
+            stored = chat_store.append_exchange(query, answer)
+            if on_stored:
+                on_stored(*stored)
 
         return answer
 
     except Exception as e:
         print(f"\nError in chatbot function: {e}")
         error_message = "I apologize, but I encountered an error. Please try again."
-        messages.append({"role": "assistant", "content": error_message})
-        save_chat_log(messages)
+        if record:
+            stored = chat_store.append_exchange(query, error_message)
+            if on_stored:
+                on_stored(*stored)
         return modify_answer(error_message)
 
 # Export necessary variables and functions
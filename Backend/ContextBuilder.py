@@ -0,0 +1,242 @@
+from dotenv import dotenv_values
+import threading
+import json
+import re
+import os
+
+from Backend.ChatStore import get_chat_store
+from Backend.Tokens import count_tokens, count_message_tokens, trim_to_tokens
+
+env_vars = dotenv_values(".env")
+
+CONTEXT_TOKENS = int(env_vars.get("ChatContextTokens", 4000))
+EVIDENCE_TOKENS = int(env_vars.get("SearchEvidenceTokens", 1500))
+SUMMARY_TOKENS = int(env_vars.get("ChatSummaryTokens", 400))
+SUMMARY_CHUNK_TURNS = int(env_vars.get("ChatSummaryChunkTurns", 20))
+MEMORY_TOKENS = int(env_vars.get("MemoryTokens", 300))
+SUMMARY_PATH = os.path.join("Data", "ChatSummaries.json")
+# Sentences longer than this are cut before they go into a summary, recalled turns at twice that
+MAX_SENTENCE_WORDS = 40
+
+_sentence_end = re.compile(r"(?<=[.!?])\s+|\n+")
+_word = re.compile(r"[a-z0-9']+")
+STOP_WORDS = {
+    "the", "and", "for", "are", "but", "not", "you", "your", "all", "any", "can", "had", "her", "was", "one",
+    "our", "out", "has", "have", "him", "his", "how", "its", "may", "now", "see", "two", "way", "who", "did",
+    "get", "got", "let", "say", "she", "too", "use", "that", "with", "this", "from", "they", "will", "would",
+    "there", "their", "what", "about", "which", "when", "make", "like", "just", "know", "take", "into", "some",
+    "could", "them", "than", "then", "also", "been", "were", "here", "more", "very", "much", "sure", "okay",
+}
+
+
+def split_sentences(turn: dict) -> list:
+    """Sentences of a chat turn worth keeping in a summary, prefixed with who said them."""
+    speaker = "User" if turn["role"] == "user" else "Assistant"
+    sentences = []
+    for sentence in _sentence_end.split(str(turn.get("content", ""))):
+        words = sentence.split()
+        # Skips separators, greetings and other fragments
+        if len(words) < 3:
+            continue
+        if len(words) > MAX_SENTENCE_WORDS:
+            words = words[:MAX_SENTENCE_WORDS] + ["..."]
+        sentences.append(f"{speaker}: {' '.join(words)}")
+    return sentences
+
+
+def extract_summary(sentences: list, budget: int) -> list:
+    """Pick the most informative sentences that fit in budget, in their original order.
+
+    A sentence scores by how many distinct content words it has that the
+    sentences picked so far do not, weighted towards later sentences so a
+    rolling summary follows the conversation. Sentences adding fewer than two
+    new words are left out.
+    """
+    candidates = []
+    for position, sentence in enumerate(sentences):
+        words = {word for word in _word.findall(sentence.lower().split(":", 1)[-1])
+                 if len(word) > 2 and word not in STOP_WORDS}
+        candidates.append((position, sentence, words))
+
+    def score(candidate):
+        position, _, words = candidate
+        new_words = len(words - covered)
+        return new_words * (0.5 + 0.5 * (position + 1) / len(sentences)) if new_words >= 2 else 0
+
+    chosen, covered = [], set()
+    while candidates and budget > 0:
+        best = max(candidates, key=score)
+        if score(best) == 0:
+            break
+        candidates.remove(best)
+        cost = count_tokens(best[1]) + 1
+        if cost > budget:
+            continue
+        budget -= cost
+        covered |= best[2]
+        chosen.append(best)
+    return [sentence for _, sentence, _ in sorted(chosen)]
+
+
+def compact_turn(turn: dict) -> str:
+    """One line for a recalled turn, without the separators and wrapping of displayed answers."""
+    speaker = "User" if turn["role"] == "user" else "Assistant"
+    words = re.sub(r"-{3,}", " ", str(turn.get("content", ""))).split()
+    if len(words) > MAX_SENTENCE_WORDS * 2:
+        words = words[:MAX_SENTENCE_WORDS * 2] + ["..."]
+    return f"{speaker}: {' '.join(words)}"
+
+
+class ContextBuilder:
+    """Chat context for the Groq models, filled in priority order up to a token budget.
+
+    The system prompt and time information always go in, then search
+    evidence (up to its own cap), then the most recent turns that fit. Older
+    turns recalled by the memory index for this question are added next, and
+    everything older is represented by an extractive rolling summary: every
+    SUMMARY_CHUNK_TURNS turns are folded into the summary of everything before
+    them, and each chunk's result is cached in Data/ChatSummaries.json, so a
+    turn only summarizes the few turns since the last finished chunk.
+    """
+
+    def __init__(self, store=None, budget=CONTEXT_TOKENS, evidence_budget=EVIDENCE_TOKENS,
+                 summary_budget=SUMMARY_TOKENS, chunk_turns=SUMMARY_CHUNK_TURNS, path=SUMMARY_PATH,
+                 memory_budget=MEMORY_TOKENS):
+        self.store = store or get_chat_store()
+        self.budget = budget
+        self.evidence_budget = evidence_budget
+        self.summary_budget = summary_budget
+        self.memory_budget = memory_budget
+        self.chunk_turns = chunk_turns
+        self.path = path
+        self._lock = threading.Lock()
+        self._rolling = []  # rolling summary sentences after each finished chunk
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                stored = json.load(file)
+            # Summaries of another conversation (a chat log that was reset) are not reused
+            if stored["chunk_turns"] == chunk_turns and stored["budget"] == summary_budget \
+                    and stored["log"] == self.store.fingerprint():
+                self._rolling = stored["rolling"][:len(self.store) // chunk_turns]
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+
+    def build(self, system: list, time_info: str = None, evidence: str = None, memories: list = None,
+              pending: dict = None) -> list:
+        """Return the messages to send: system, summary, recalled turns, evidence, time information and recent turns.
+
+        memories are past turns with their "seq", as returned by MemoryIndex.recall.
+        pending is a turn that is answered but not stored (yet), sent as the newest one.
+        """
+        fixed = list(system)
+        if time_info:
+            fixed.append({"role": "system", "content": time_info})
+        remaining = self.budget - sum(count_message_tokens(message) for message in fixed)
+
+        # One snapshot: a speculative answer may append turns while this one is built
+        count, turns = self.store.snapshot()
+        first_seq = count - len(turns)
+        if pending:
+            turns.append(pending)
+        # The newest turn is the question being answered, so room is always kept for it
+        if turns:
+            remaining -= count_message_tokens(turns[-1])
+
+        evidence_message = None
+        if evidence:
+            evidence = trim_to_tokens(evidence, max(0, min(self.evidence_budget, remaining)))
+            if evidence:
+                evidence_message = {"role": "system", "content": evidence}
+                remaining -= count_message_tokens(evidence_message)
+
+        recent = turns[-1:]
+        # Older turns are summarized or recalled, so room for them is held back while choosing recent ones
+        reserve = 0
+        if first_seq + len(turns) > len(recent):
+            reserve += min(self.summary_budget, max(0, remaining // 4))
+        if memories:
+            reserve += min(self.memory_budget, max(0, remaining // 4))
+        for turn in reversed(turns[:-1]):
+            cost = count_message_tokens(turn)
+            if cost > remaining - reserve:
+                break
+            remaining -= cost
+            recent.insert(0, turn)
+
+        messages = list(system)
+        first_recent = first_seq + len(turns) - len(recent)
+        recalled = []
+        memory_room = min(self.memory_budget, max(0, remaining))
+        for turn in memories or []:
+            # Turns that made it in as recent ones are not repeated
+            if turn["seq"] >= first_recent:
+                continue
+            line = compact_turn(turn)
+            if count_tokens(line) + 1 > memory_room:
+                break
+            memory_room -= count_tokens(line) + 1
+            recalled.append((turn["seq"], line))
+        if recalled:
+            remaining -= sum(count_tokens(line) + 1 for _, line in recalled) + 4
+        if first_recent > 0:
+            summary = self.summary(first_recent, min(self.summary_budget, max(0, remaining)))
+            if summary:
+                messages.append({"role": "system", "content": "Summary of the earlier conversation:\n"
+                                 + "\n".join(f"- {sentence}" for sentence in summary)})
+        if recalled:
+            messages.append({"role": "system", "content": "Earlier turns related to this question:\n"
+                             + "\n".join(line for _, line in sorted(recalled))})
+        if evidence_message:
+            messages.append(evidence_message)
+        if time_info:
+            messages.append({"role": "system", "content": time_info})
+        return messages + recent
+
+    def summary(self, stop: int, budget: int) -> list:
+        """Summary sentences of turns [0, stop)."""
+        if budget <= 0:
+            return []
+        chunks = stop // self.chunk_turns
+        rolling = self._rolling_until(chunks)
+        # Turns after the last finished chunk are summarized on the fly; there are fewer than chunk_turns
+        recent = self.store.read_range(chunks * self.chunk_turns, stop)
+        sentences = rolling + [sentence for turn in recent for sentence in split_sentences(turn)]
+        return extract_summary(sentences, budget)
+
+    def _rolling_until(self, chunks: int) -> list:
+        with self._lock:
+            if chunks == 0:
+                return []
+            if len(self._rolling) < chunks:
+                previous = self._rolling[-1] if self._rolling else []
+                start = len(self._rolling) * self.chunk_turns
+                turns = self.store.read_range(start, chunks * self.chunk_turns)
+                for offset in range(0, len(turns), self.chunk_turns):
+                    sentences = [sentence for turn in turns[offset:offset + self.chunk_turns]
+                                 for sentence in split_sentences(turn)]
+                    previous = extract_summary(previous + sentences, self.summary_budget)
+                    self._rolling.append(previous)
+                self._save()
+            return self._rolling[chunks - 1]
+
+    def _save(self) -> None:
+        try:
+            with open(self.path + ".tmp", "w", encoding="utf-8") as file:
+                json.dump({"chunk_turns": self.chunk_turns, "budget": self.summary_budget,
+                           "log": self.store.fingerprint(), "rolling": self._rolling}, file)
+            os.replace(self.path + ".tmp", self.path)
+        except Exception as e:
+            print(f"Error saving chat summaries: {e}")
+
+
+_context_builder = None
+_context_builder_lock = threading.Lock()
+
+
+def get_context_builder() -> ContextBuilder:
+    """Return the process-wide context builder."""
+    global _context_builder
+    with _context_builder_lock:
+        if _context_builder is None:
+            _context_builder = ContextBuilder()
+        return _context_builder
@@ -0,0 +1,118 @@
+from typing import Any, Callable, NamedTuple, Optional
+import threading
+import json
+import os
+
+
+class Topic(NamedTuple):
+    """A typed channel on the bus, optionally mirrored to a .data file."""
+    name: str
+    type: type
+    default: Any
+    filename: Optional[str] = None
+    encode: Callable[[Any], str] = str
+
+
+# Topics shared between the backend loop and the GUI
+MIC = Topic("mic", bool, False, "Mic.data")
+STATUS = Topic("status", str, "Ready", "Status.data")
+# Text shown in the chat, with the chat store "seq" of the turn and of the "question" it answers, if stored
+RESPONSE = Topic("response", dict, {"text": ""}, "Responses.data", lambda response: response["text"])
+IMAGE_JOB = Topic("image_job", dict, {}, "ImageGeneration.data", json.dumps)  # Latest ImageJob.to_dict()
+IMAGE_CANCEL = Topic("image_cancel", int, 0)  # Id of an image job the user cancelled
+
+TOPICS = [MIC, STATUS, RESPONSE, IMAGE_JOB, IMAGE_CANCEL]
+
+
+class EventBus:
+    """Thread-safe publish/subscribe bus that remembers the last value of every topic."""
+
+    def __init__(self, topics=TOPICS):
+        self._condition = threading.Condition()
+        self._values = {topic.name: topic.default for topic in topics}
+        self._subscribers = {topic.name: [] for topic in topics}
+
+    def publish(self, topic: Topic, value) -> None:
+        """Store the new value, wake up waiters and notify subscribers."""
+        if not isinstance(value, topic.type):
+            raise TypeError(f"{topic.name} expects {topic.type.__name__}, got {type(value).__name__}")
+
+        with self._condition:
+            self._values[topic.name] = value
+            subscribers = list(self._subscribers[topic.name])
+            self._condition.notify_all()
+
+        for callback in subscribers:
+            try:
+                callback(value)
+            except Exception as e:
+                print(f"Error in {topic.name} subscriber: {e}")
+
+    def get(self, topic: Topic):
+        """Return the last published value of a topic."""
+        with self._condition:
+            return self._values[topic.name]
+
+    def subscribe(self, topic: Topic, callback: Callable[[Any], None]) -> Callable[[], None]:
+        """Register a callback and return a function that removes it again."""
+        with self._condition:
+            self._subscribers[topic.name].append(callback)
+
+        def unsubscribe():
+            with self._condition:
+                if callback in self._subscribers[topic.name]:
+                    self._subscribers[topic.name].remove(callback)
+
+        return unsubscribe
+
+    def wait_for(self, topic: Topic, predicate: Callable[[Any], bool], timeout: Optional[float] = None):
+        """Block without polling until the topic's value satisfies the predicate."""
+        with self._condition:
+            self._condition.wait_for(lambda: predicate(self._values[topic.name]), timeout=timeout)
+            return self._values[topic.name]
+
+
+class FileMirror:
+    """Mirror bus topics into .data files for out-of-process consumers.
+
+    Writes happen on a single background thread and only the latest value of
+    each topic is written, so bursts of publishes never touch the disk more
+    than once per topic.
+    """
+
+    def __init__(self, bus: EventBus, directory: str, topics=TOPICS):
+        self.directory = directory
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+
+        for topic in topics:
+            if topic.filename:
+                bus.subscribe(topic, lambda value, topic=topic: self._schedule(topic, value))
+
+        self._thread = threading.Thread(target=self._run, name="FileMirror", daemon=True)
+        self._thread.start()
+
+    def _schedule(self, topic: Topic, value) -> None:
+        with self._lock:
+            self._pending[topic.name] = (topic, value)
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            with self._lock:
+                pending, self._pending = self._pending, {}
+
+            for topic, value in pending.values():
+                try:
+                    with open(os.path.join(self.directory, topic.filename), "w", encoding='utf-8') as file:
+                        file.write(topic.encode(value))
+                except Exception as e:
+                    print(f"Error mirroring {topic.name} to {topic.filename}: {e}")
+
+
+# Process-wide bus shared by Main, the backend modules and the GUI
+bus = EventBus()
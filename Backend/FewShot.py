@@ -0,0 +1,52 @@
+from collections import deque
+import re
+
+from Backend.Tokens import count_tokens
+
+
+def _words(text: str) -> set:
+    return set(re.findall(r"\w+", text.lower()))
+
+
+class FewShotContext:
+    """Few-shot chat history for the decision model with a bounded size.
+
+    A fixed seed of examples is always sent. Past decisions are kept in a
+    rolling window and only as many as fit in the token budget are added,
+    either the most recent ones or the ones most similar to the new query.
+    """
+
+    def __init__(self, seed, token_budget=400, window=50, select_similar=False):
+        self.seed = list(seed)
+        self.token_budget = token_budget
+        self.select_similar = select_similar
+        self._examples = deque(maxlen=window)  # [(query, decision)]
+
+    def record(self, query: str, decision: str) -> None:
+        if decision:
+            self._examples.append((query, decision))
+
+    def build(self, query: str) -> list:
+        """Return the chat history to send with query."""
+        examples = list(enumerate(self._examples))
+        if self.select_similar:
+            query_words = _words(query)
+            examples.sort(key=lambda item: len(query_words & _words(item[1][0])) /
+                          (len(query_words | _words(item[1][0])) or 1), reverse=True)
+        else:
+            examples.reverse()
+
+        chosen = []
+        budget = self.token_budget
+        for position, (example_query, decision) in examples:
+            cost = count_tokens(example_query) + count_tokens(decision)
+            if cost > budget:
+                continue
+            budget -= cost
+            chosen.append((position, example_query, decision))
+
+        history = list(self.seed)
+        for _, example_query, decision in sorted(chosen):
+            history.append({"role": "User", "message": example_query})
+            history.append({"role": "Chatbot", "message": decision})
+        return history
@@ -1,29 +1,18 @@
 import asyncio
 from random import randint
 from PIL import Image
-import requests
 from dotenv import load_dotenv
 import os
-from time import sleep
+import sys
+
+from Backend.Providers import get_http_session
+from Backend.ImageStore import get_image_store
+from Backend.Tracing import tracer
 
 # Load environment variables at the start
 load_dotenv()
 
 
-def setup_data_file():
-    """Create necessary directories and data file if they don't exist"""
-    # Create directory structure with the new path
-    data_dir = r"Frontend\Files"
-    os.makedirs(data_dir, exist_ok=True)
-
-    # Create ImageGeneration.data file if it doesn't exist
-    data_file_path = os.path.join(data_dir, "ImageGeneration.data")
-    if not os.path.exists(data_file_path):
-        with open(data_file_path, "w") as f:
-            f.write(",False")  # Initialize with empty prompt and False status
-    return data_file_path
-
-
 def get_api_key():
     """Retrieve API key from environment variables"""
     api_key = os.getenv('HuggingFaceAPIKey')
@@ -32,34 +21,33 @@ def get_api_key():
     return api_key
 
 
-def open_images(prompt: str) -> None:
+def open_images(paths: list) -> None:
     """Open generated images using PIL"""
-    folder_path = r"Data"
-    prompt = prompt.replace(" ", "_")
-    files = [f"{prompt}{i}.jpg" for i in range(1, 5)]
-
-    for jpg_file in files:
-        image_path = os.path.join(folder_path, jpg_file)
+    for image_path in paths:
         try:
             img = Image.open(image_path)
             print(f"Opening image: {image_path}")
             img.show()
-            sleep(1)
         except IOError as e:
             print(f"Unable to open {image_path}: {e}")
 
 
 # API configuration
-API_URL = "https://api-inference.huggingface.co/models/stabilityai/stable-diffusion-xl-base-1.0"
-headers = {"Authorization": f"Bearer {get_api_key()}"}
+MODEL = "stabilityai/stable-diffusion-xl-base-1.0"
+API_URL = f"https://api-inference.huggingface.co/models/{MODEL}"
+
+
+def get_headers() -> dict:
+    """Build the request headers when the first image is requested, not at import"""
+    return {"Authorization": f"Bearer {get_api_key()}"}
 
 
 async def query(payload: dict) -> bytes:
     """Send request to Hugging Face API"""
     response = await asyncio.to_thread(
-        requests.post,
+        get_http_session().post,
         API_URL,
-        headers=headers,
+        headers=get_headers(),
         json=payload
     )
     if response.status_code != 200:
@@ -67,26 +55,25 @@ async def query(payload: dict) -> bytes:
     return response.content
 
 
-async def generate_images(prompt: str) -> None:
-    """Generate multiple images asynchronously"""
-    tasks = []
-    for i in range(5):
+@tracer.traced(cat="image")
+async def generate_image(prompt: str, seed: int = None) -> str:
+    """Generate one image for prompt and return its path in the image store once its thumbnail exists"""
+    seed = randint(0, 1000000) if seed is None else seed
+    store = get_image_store()
+    filepath = store.get(prompt, seed, MODEL)
+    if filepath is None:
         payload = {
-            "inputs": f"{prompt}, quality=4K, sharpness=maximum, Ultra High details, high resolution, seed={randint(0, 1000000)}"
+            "inputs": f"{prompt}, quality=4K, sharpness=maximum, Ultra High details, high resolution, seed={seed}"
         }
-        task = asyncio.create_task(query(payload))
-        tasks.append(task)
+        filepath = store.put(prompt, seed, MODEL, await query(payload))
+    await asyncio.wrap_future(store.make_preview(filepath))
+    return filepath
 
+
+async def generate_images(prompt: str, count: int = 4) -> list:
+    """Generate multiple images asynchronously"""
     try:
-        image_bytes_list = await asyncio.gather(*tasks)
-        folder_path = r"Data"
-        os.makedirs(folder_path, exist_ok=True)
-
-        for i, image_bytes in enumerate(image_bytes_list):
-            filename = f"{prompt.replace(' ', '_')}{i + 1}.jpg"
-            filepath = os.path.join(folder_path, filename)
-            with open(filepath, "wb") as f:
-                f.write(image_bytes)
+        return await asyncio.gather(*(generate_image(prompt) for _ in range(count)))
     except Exception as e:
         print(f"Error generating images: {e}")
         raise
@@ -95,53 +82,13 @@ async def generate_images(prompt: str) -> None:
 def GenerateImages(prompt: str) -> bool:
     """Main function to generate and display images"""
     try:
-        asyncio.run(generate_images(prompt))
-        open_images(prompt)
+        open_images(asyncio.run(generate_images(prompt)))
         return True
     except Exception as e:
         print(f"Error in GenerateImages: {e}")
         return False
 
 
-def main():
-    # Setup the data file with the new path
-    data_file_path = setup_data_file()
-
-    while True:
-        try:
-            with open(data_file_path, "r") as f:
-                data = f.read().strip()
-
-            if not data:
-                print("Empty data file")
-                sleep(1)
-                continue
-
-            prompt, status = data.split(",")
-
-            if status.lower() == "true":
-                print("Generating Images.....")
-                success = GenerateImages(prompt=prompt)
-
-                with open(data_file_path, "w") as f:
-                    f.write(f"{prompt},False")
-
-                if success:
-                    break
-            else:
-                sleep(1)
-
-        except FileNotFoundError:
-            print("ImageGeneration.data file not found, recreating...")
-            setup_data_file()
-            sleep(1)
-        except ValueError as e:
-            print(f"Invalid data format in file: {e}")
-            sleep(1)
-        except Exception as e:
-            print(f"Unexpected error: {e}")
-            sleep(1)
-
-
 if __name__ == "__main__":
-    main()
+    # python -m Backend.ImageGenration "a prompt, commas allowed"
+    GenerateImages(" ".join(sys.argv[1:]))
@@ -0,0 +1,161 @@
+from dotenv import dotenv_values
+import threading
+import asyncio
+import queue
+import itertools
+
+from Backend.EventBus import bus, IMAGE_JOB, IMAGE_CANCEL
+from Backend.ImageGenration import generate_image
+from Backend.Tracing import tracer
+
+env_vars = dotenv_values(".env")
+
+IMAGE_WORKERS = int(env_vars.get("ImageWorkers", 2))
+IMAGE_QUEUE_SIZE = int(env_vars.get("ImageQueueSize", 8))
+IMAGE_BATCH_SIZE = int(env_vars.get("ImageBatchSize", 4))
+IMAGES_PER_PROMPT = int(env_vars.get("ImagesPerPrompt", 4))
+
+_job_ids = itertools.count(1)
+
+
+class ImageJob:
+    """One image request and its progress: queued -> running -> done | failed | cancelled."""
+
+    def __init__(self, prompt: str, count: int = IMAGES_PER_PROMPT):
+        self.id = next(_job_ids)
+        self.prompt = prompt
+        self.count = count
+        self.state = "queued"
+        self.paths = []
+        self.error = None
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+        # Spans of the job belong to the turn that asked for it
+        self.trace = tracer.current_trace()
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "prompt": self.prompt, "state": self.state, "done": len(self.paths),
+                "total": self.count, "paths": list(self.paths), "error": self.error}
+
+
+class ImageJobQueue:
+    """Bounded in-process queue of image jobs served by a small pool of worker threads.
+
+    Every state change and every finished image is published on the IMAGE_JOB
+    topic. A worker takes the next job together with whatever else is queued
+    (up to batch_size) and requests all their images concurrently on one event
+    loop, so a burst of prompts costs one round of API latency, not several.
+    Finished images are shown by the gallery, which listens to the same topic.
+    """
+
+    def __init__(self, workers=IMAGE_WORKERS, max_queued=IMAGE_QUEUE_SIZE, batch_size=IMAGE_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        # The GUI cancels jobs through the bus so it does not have to import this module
+        bus.subscribe(IMAGE_CANCEL, self.cancel)
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"ImageWorker-{i}", daemon=True).start()
+
+    def submit(self, prompt: str, count: int = IMAGES_PER_PROMPT) -> ImageJob:
+        """Queue a prompt; raises queue.Full when too many jobs are waiting."""
+        job = ImageJob(prompt, count)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._publish(job)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self._finish(job, "failed")
+            raise
+        return job
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a queued or running job; images that already finished are kept."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job.finished.is_set():
+            return False
+        job.cancelled.set()
+        return True
+
+    def jobs(self) -> list:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _publish(self, job: ImageJob) -> None:
+        bus.publish(IMAGE_JOB, job.to_dict())
+
+    def _worker(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            batch = [job for job in batch if not self._skip_cancelled(job)]
+            if batch:
+                asyncio.run(self._run_batch(batch))
+
+    def _skip_cancelled(self, job: ImageJob) -> bool:
+        if job.cancelled.is_set():
+            self._finish(job, "cancelled")
+            return True
+        return False
+
+    async def _run_batch(self, batch: list) -> None:
+        await asyncio.gather(*(self._run_job(job) for job in batch))
+
+    async def _run_job(self, job: ImageJob) -> None:
+        with tracer.use(job.trace):
+            async with tracer.async_span("image job", cat="image", prompt=job.prompt):
+                await self._generate(job)
+
+    async def _generate(self, job: ImageJob) -> None:
+        job.state = "running"
+        self._publish(job)
+        pending = {asyncio.create_task(generate_image(job.prompt)) for _ in range(job.count)}
+        errors = []
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=0.25, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception():
+                    errors.append(str(task.exception()))
+                else:
+                    job.paths.append(task.result())
+                    self._publish(job)
+            if job.cancelled.is_set():
+                # Requests already sent finish in their threads; their images are dropped
+                for task in pending:
+                    task.cancel()
+                self._finish(job, "cancelled")
+                return
+
+        if not job.paths:
+            job.error = errors[0] if errors else "No images were generated"
+            print(f"Error generating images for '{job.prompt}': {job.error}")
+            self._finish(job, "failed")
+            return
+        self._finish(job, "done")
+
+    def _finish(self, job: ImageJob, state: str) -> None:
+        job.state = state
+        job.finished.set()
+        self._publish(job)
+        with self._lock:
+            self._jobs.pop(job.id, None)
+
+
+_image_jobs = None
+_image_jobs_lock = threading.Lock()
+
+
+def get_image_jobs() -> ImageJobQueue:
+    """Return the process-wide image job queue, starting its workers on first use."""
+    global _image_jobs
+    with _image_jobs_lock:
+        if _image_jobs is None:
+            _image_jobs = ImageJobQueue()
+        return _image_jobs
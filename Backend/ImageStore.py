@@ -0,0 +1,173 @@
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from dotenv import dotenv_values
+import threading
+import hashlib
+import json
+import time
+import os
+
+env_vars = dotenv_values(".env")
+
+IMAGE_STORE_BYTES = int(env_vars.get("ImageStoreMB", 500)) * 1024 * 1024
+THUMBNAIL_SIZE = int(env_vars.get("ThumbnailSize", 256))
+THUMBNAIL_WORKERS = int(env_vars.get("ThumbnailWorkers", 2))
+
+
+def make_preview(path: str, thumbnail_path: str, size: int) -> str:
+    """Write a downscaled JPEG preview of path and re-encode the original if it is not a JPEG.
+
+    Runs in a worker process, so it only takes and returns plain paths.
+    """
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image.load()
+        source_format = image.format
+    image = image.convert("RGB")
+
+    if source_format != "JPEG":
+        image.save(path + ".tmp", "JPEG", quality=90, optimize=True)
+        os.replace(path + ".tmp", path)
+
+    image.thumbnail((size, size))
+    image.save(thumbnail_path + ".tmp", "JPEG", quality=80)
+    os.replace(thumbnail_path + ".tmp", thumbnail_path)
+    return thumbnail_path
+
+
+class ImageStore:
+    """Generated images addressed by the hash of (prompt, seed, model).
+
+    The same request is never stored twice. Every image gets a thumbnail made
+    by a process pool, and the directory is kept under max_bytes by removing
+    the least recently used images (by modification time, bumped on reads).
+    """
+
+    def __init__(self, directory=os.path.join("Data", "Images"), max_bytes=IMAGE_STORE_BYTES,
+                 thumbnail_size=THUMBNAIL_SIZE, workers=THUMBNAIL_WORKERS):
+        self.directory = directory
+        self.thumbnail_directory = os.path.join(directory, "thumbnails")
+        self.index_path = os.path.join(directory, "index.json")
+        self.max_bytes = max_bytes
+        self.thumbnail_size = thumbnail_size
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+        os.makedirs(self.thumbnail_directory, exist_ok=True)
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                self._index = json.load(file)  # key -> {"prompt", "seed", "model", "created"}
+        except (FileNotFoundError, ValueError):
+            self._index = {}
+        # Drop entries whose image was deleted by hand
+        self._index = {key: entry for key, entry in self._index.items() if os.path.exists(self.path_for(key))}
+
+    @staticmethod
+    def key_for(prompt: str, seed: int, model: str) -> str:
+        return hashlib.sha256("\0".join((model, str(seed), prompt)).encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.jpg")
+
+    def thumbnail_for(self, key: str) -> str:
+        return os.path.join(self.thumbnail_directory, f"{key}.jpg")
+
+    def get(self, prompt: str, seed: int, model: str):
+        """Return the stored image path or None."""
+        path = self.path_for(self.key_for(prompt, seed, model))
+        try:
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            return None
+
+    def put(self, prompt: str, seed: int, model: str, data: bytes) -> str:
+        """Store image bytes and return their path; an existing image for the same key is kept."""
+        key = self.key_for(prompt, seed, model)
+        path = self.path_for(key)
+        with self._lock:
+            if key not in self._index:
+                with open(path + ".tmp", "wb") as file:
+                    file.write(data)
+                os.replace(path + ".tmp", path)
+                self._index[key] = {"prompt": prompt, "seed": seed, "model": model, "created": time.time()}
+                self._evict(keep=key)
+                self._save_index()
+        return path
+
+    def make_preview(self, path: str) -> Future:
+        """Create the thumbnail of a stored image in the process pool; the future resolves to its path."""
+        key = os.path.splitext(os.path.basename(path))[0]
+        arguments = (path, self.thumbnail_for(key), self.thumbnail_size)
+        try:
+            return self._get_pool().submit(make_preview, *arguments)
+        except (BrokenProcessPool, OSError, RuntimeError) as e:
+            print(f"Error starting thumbnail workers, resizing in this process: {e}")
+            future = Future()
+            try:
+                future.set_result(make_preview(*arguments))
+            except Exception as error:
+                future.set_exception(error)
+            return future
+
+    def entries(self) -> list:
+        """Stored images, newest first, as dicts with key, prompt, path and thumbnail (None until made)."""
+        with self._lock:
+            items = sorted(self._index.items(), key=lambda item: item[1]["created"], reverse=True)
+        result = []
+        for key, entry in items:
+            thumbnail = self.thumbnail_for(key)
+            result.append(dict(entry, key=key, path=self.path_for(key),
+                               thumbnail=thumbnail if os.path.exists(thumbnail) else None))
+        return result
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def _evict(self, keep: str) -> None:
+        files = []
+        for key in self._index:
+            try:
+                stat = os.stat(self.path_for(key))
+            except FileNotFoundError:
+                continue
+            thumbnail = self.thumbnail_for(key)
+            size = stat.st_size + (os.path.getsize(thumbnail) if os.path.exists(thumbnail) else 0)
+            files.append((stat.st_mtime, key, size))
+        total = sum(size for _, _, size in files)
+        for _, key, size in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            for path in (self.path_for(key), self.thumbnail_for(key)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass  # Open in a viewer or already gone
+            del self._index[key]
+            total -= size
+
+    def _save_index(self) -> None:
+        try:
+            with open(self.index_path + ".tmp", "w", encoding="utf-8") as file:
+                json.dump(self._index, file)
+            os.replace(self.index_path + ".tmp", self.index_path)
+        except Exception as e:
+            print(f"Error saving image index: {e}")
+
+
+_image_store = None
+_image_store_lock = threading.Lock()
+
+
+def get_image_store() -> ImageStore:
+    """Return the process-wide image store."""
+    global _image_store
+    with _image_store_lock:
+        if _image_store is None:
+            _image_store = ImageStore()
+        return _image_store
@@ -0,0 +1,274 @@
+from collections import Counter
+from dotenv import dotenv_values
+import numpy as np
+import json
+import math
+import sys
+import os
+import re
+
+env_vars = dotenv_values(".env")
+
+DECISION_LOG_PATH = os.path.join("Data", "DecisionLog.jsonl")
+MODEL_PATH = os.path.join("Data", "IntentModel.npz")
+CONFIDENCE_THRESHOLD = float(env_vars.get("DecisionConfidence", 0.9))
+
+AUTOMATION_PREFIXES = ["open", "close", "play", "generate image", "system", "content",
+                       "google search", "youtube search"]
+# Commands the prefix matcher may decide on its own: shapes it can check without a model
+APP_COMMANDS = ["open", "close"]
+SYSTEM_COMMANDS = ["mute", "unmute", "volume up", "volume down"]
+# Questions that start like commands; the prefix matcher must leave them to the model
+NOT_COMMANDS = [
+    "open source licenses explained",
+    "system design interview tips",
+    "content marketing strategies for startups",
+    "close friends vs acquaintances",
+    "play is a word with many meanings?",
+]
+# Decisions the linear model may produce; the argument is always the whole query
+MODEL_LABELS = ["general", "realtime", "exit"]
+
+QUESTION_WORDS = ["how", "what", "who", "where", "when", "why", "which", "whose", "whom", "tell", "can", "is", "are"]
+# Without a trained model, guess() treats questions with one of these words as realtime
+REALTIME_HINTS = {"news", "latest", "headlines", "weather", "score", "won", "price", "stock", "live", "currently",
+                  "tonight", "yesterday", "trending"}
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop the punctuation QueryModifier adds and collapse whitespace."""
+    query = query.lower().strip()
+    query = re.sub(r"[^\w\s']", " ", query)
+    return " ".join(query.split())
+
+
+def known_app(command: str, name: str) -> bool:
+    """Whether name is an installed app, or for "open" also a site opened before."""
+    from Backend.AppIndex import get_app_index  # AppIndex uses normalize_query from here
+    app_index = get_app_index()
+    return bool(app_index.resolve_app(name) or (command == "open" and app_index.resolve_web(name)))
+
+
+class PrefixMatcher:
+    """Compiled matcher for automation commands spoken in the decision vocabulary.
+
+    Only system commands and open/close of a name known_app recognizes are
+    matched; anything else that merely starts with a decision keyword
+    ("open source licenses explained") is left to the model.
+    """
+
+    def __init__(self, funcs, known_app=known_app):
+        prefixes = [f for f in funcs if f in APP_COMMANDS]
+        self.known_app = known_app
+        self._command = re.compile(r"^(%s)\s+(\S.*)$" % "|".join(re.escape(p) for p in prefixes)) \
+            if prefixes else None
+        self._system = re.compile(r"^(?:please\s+)?(%s)(?:\s+(?:the\s+)?(?:volume|sound|audio))?$"
+                                  % "|".join(re.escape(c) for c in SYSTEM_COMMANDS))
+        self._split = re.compile(r"\s*(?:,|\band then\b|\band\b|\bthen\b)\s*")
+
+    def match(self, query: str):
+        """Return a decision list if every part of the query is an automation command, else None."""
+        decision = []
+        previous = None
+        for part in filter(None, map(normalize_query, self._split.split(query.lower()))):
+            system = self._system.match(part)
+            command = self._command.match(part) if self._command else None
+            if system:
+                decision.append(f"system {system.group(1)}")
+                previous = "system"
+            elif command and self.known_app(command.group(1), command.group(2)):
+                previous = command.group(1)
+                decision.append(f"{previous} {command.group(2)}")
+            elif previous in APP_COMMANDS and len(part.split()) <= 3 \
+                    and part.split()[0] not in QUESTION_WORDS and self.known_app(previous, part):
+                # "open chrome and firefox" -> "open chrome, open firefox"
+                decision.append(f"{previous} {part}")
+            else:
+                return None
+        return decision or None
+
+
+def _features(text: str) -> list:
+    words = normalize_query(text).split()
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class IntentModel:
+    """TF-IDF features with a linear softmax layer, evaluated with NumPy."""
+
+    def __init__(self, vocabulary, idf, weights, bias, labels):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.weights = weights
+        self.bias = bias
+        self.labels = labels
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        data = np.load(path, allow_pickle=False)
+        vocabulary = {term: i for i, term in enumerate(data["vocabulary"].tolist())}
+        return cls(vocabulary, data["idf"], data["weights"], data["bias"], data["labels"].tolist())
+
+    def save(self, path=MODEL_PATH):
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        np.savez(path, vocabulary=np.array(terms), idf=self.idf, weights=self.weights,
+                 bias=self.bias, labels=np.array(self.labels))
+
+    def vectorize(self, text: str):
+        """Return the (indices, values) of the l2-normalized TF-IDF vector."""
+        counts = Counter(i for i in map(self.vocabulary.get, _features(text)) if i is not None)
+        if not counts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts)) * self.idf[indices]
+        return indices, values / np.linalg.norm(values)
+
+    def predict(self, text: str):
+        """Return (label, probability) of the most likely class."""
+        indices, values = self.vectorize(text)
+        scores = self.weights[:, indices] @ values + self.bias
+        scores = np.exp(scores - scores.max())
+        probabilities = scores / scores.sum()
+        best = int(probabilities.argmax())
+        return self.labels[best], float(probabilities[best])
+
+
+def _decision_label(decision):
+    """Map a logged decision list to a single training label, or None for multi-intent turns."""
+    if len(decision) != 1:
+        return None
+    for label in MODEL_LABELS + AUTOMATION_PREFIXES + ["reminder"]:
+        if decision[0].lower().startswith(label):
+            return label
+    return None
+
+
+def train(log_path=DECISION_LOG_PATH, model_path=MODEL_PATH, epochs=300, learning_rate=5.0, l2=1e-4):
+    """Fit the intent model offline on logged (query, decision) pairs."""
+    queries, targets = [], []
+    with open(log_path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            label = _decision_label(entry["decision"])
+            if label:
+                queries.append(entry["query"])
+                targets.append(label)
+
+    labels = sorted(set(targets))
+    if len(labels) < 2:
+        raise ValueError("Need logged decisions of at least two kinds to train")
+
+    document_frequency = Counter(term for query in queries for term in set(_features(query)))
+    terms = sorted(term for term, df in document_frequency.items() if df >= 2) or sorted(document_frequency)
+    vocabulary = {term: i for i, term in enumerate(terms)}
+    idf = np.array([math.log((1 + len(queries)) / (1 + document_frequency[t])) + 1 for t in terms],
+                   dtype=np.float32)
+
+    model = IntentModel(vocabulary, idf, np.zeros((len(labels), len(terms)), dtype=np.float32),
+                        np.zeros(len(labels), dtype=np.float32), labels)
+    features = np.zeros((len(queries), len(terms)), dtype=np.float32)
+    for row, query in enumerate(queries):
+        indices, values = model.vectorize(query)
+        features[row, indices] = values
+    one_hot = np.eye(len(labels), dtype=np.float32)[[labels.index(t) for t in targets]]
+
+    # Full-batch gradient descent on the softmax cross-entropy
+    for _ in range(epochs):
+        scores = features @ model.weights.T + model.bias
+        scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+        error = scores / scores.sum(axis=1, keepdims=True) - one_hot
+        model.weights -= learning_rate * (error.T @ features / len(queries) + l2 * model.weights)
+        model.bias -= learning_rate * error.mean(axis=0)
+
+    model.save(model_path)
+    accuracy = float((np.argmax(features @ model.weights.T + model.bias, axis=1) == one_hot.argmax(axis=1)).mean())
+    return len(queries), accuracy
+
+
+def log_decision(query: str, decision: list, path=DECISION_LOG_PATH) -> None:
+    """Record a decision from the remote model as training data for the local one."""
+    try:
+        with open(path, "a", encoding="utf-8") as file:
+            file.write(json.dumps({"query": query, "decision": decision}) + "\n")
+    except Exception as e:
+        print(f"Error logging decision: {e}")
+
+
+class IntentClassifier:
+    """Local first stage of the decision model.
+
+    Automation commands are resolved by the prefix matcher, everything else by
+    the trained model. classify() returns None whenever neither is confident,
+    in which case the caller should ask the remote model.
+    """
+
+    def __init__(self, funcs, model_path=MODEL_PATH, threshold=CONFIDENCE_THRESHOLD):
+        self.matcher = PrefixMatcher(funcs)
+        self.threshold = threshold
+        self.model = None
+        if os.path.exists(model_path):
+            try:
+                self.model = IntentModel.load(model_path)
+            except Exception as e:
+                print(f"Error loading intent model: {e}")
+
+    def classify(self, query: str):
+        decision = self.matcher.match(query)
+        if decision:
+            return decision
+
+        if self.model is None:
+            return None
+        normalized = normalize_query(query)
+        # Multi-intent turns need the remote model to split them
+        if any(f" {word} " in f" {normalized} " for word in ("and", "then")):
+            return None
+        label, probability = self.model.predict(query)
+        if label not in MODEL_LABELS or probability < self.threshold:
+            return None
+        if label == "exit":
+            return ["exit"]
+        return [f"{label} {query.strip().lower()}"]
+
+    def guess(self, query: str):
+        """Most likely answer kind of a query as (label, probability), even when classify() would not commit.
+
+        Automation commands and multi-intent queries give None. Without a
+        trained model, questions are guessed from keywords with probability 0.5.
+        """
+        if self.matcher.match(query):
+            return None
+        normalized = normalize_query(query)
+        if not normalized or any(f" {word} " in f" {normalized} " for word in ("and", "then")):
+            return None
+        if self.model is not None:
+            return self.model.predict(query)
+        words = normalized.split()
+        if words[0] not in QUESTION_WORDS + ["explain", "describe", "define"]:
+            return None
+        return ("realtime" if REALTIME_HINTS & set(words) else "general"), 0.5
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "train":
+        count, accuracy = train()
+        print(f"Trained on {count} decisions, training accuracy {accuracy:.1%}, saved to {MODEL_PATH}")
+    elif len(sys.argv) > 1 and sys.argv[1] == "check":
+        # The prefix matcher against a fixed app list: commands it must take, questions it must leave
+        matcher = PrefixMatcher(AUTOMATION_PREFIXES, known_app=lambda command, name: name in ("chrome", "spotify"))
+        expected = {"open chrome": ["open chrome"], "open chrome and spotify": ["open chrome", "open spotify"],
+                    "close spotify": ["close spotify"], "volume up": ["system volume up"],
+                    "please mute the sound": ["system mute"], "open the pod bay doors": None,
+                    **{query: None for query in NOT_COMMANDS}}
+        failed = [query for query, decision in expected.items() if matcher.match(query) != decision]
+        for query in failed:
+            print(f"{query!r}: expected {expected[query]}, got {matcher.match(query)}")
+        print(f"{len(expected) - len(failed)}/{len(expected)} prefix matcher cases passed")
+        sys.exit(1 if failed else 0)
+    else:
+        classifier = IntentClassifier(AUTOMATION_PREFIXES + MODEL_LABELS)
+        while True:
+            print(classifier.classify(input(">>> ")))
@@ -0,0 +1,189 @@
+from collections import Counter
+from dotenv import dotenv_values
+import numpy as np
+import threading
+import zlib
+import os
+
+from Backend.ChatStore import get_chat_store
+from Backend.ContextBuilder import STOP_WORDS
+from Backend.IntentClassifier import normalize_query
+
+env_vars = dotenv_values(".env")
+
+MEMORY_PATH = os.path.join("Data", "MemoryIndex.npz")
+DIMENSIONS = int(env_vars.get("MemoryDimensions", 512))
+RESULTS = int(env_vars.get("MemoryResults", 3))
+MIN_SCORE = float(env_vars.get("MemoryMinScore", 0.25))
+# The index is written to disk after this many new turns; turns missing from it are re-read from the chat log
+SAVE_EVERY = 50
+
+
+def _features(text: str) -> list:
+    words = [word for word in normalize_query(text).split() if len(word) > 2 and word not in STOP_WORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def hashed_vector(text: str, dimensions: int = DIMENSIONS) -> np.ndarray:
+    """Sublinear term frequencies of words and word pairs, hashed into a fixed number of signed buckets."""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    counts = Counter(zlib.crc32(feature.encode("utf-8")) for feature in _features(text))
+    if counts:
+        hashes = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = 1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        # The sign bit keeps colliding features from only ever adding up
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, hashes % dimensions, signs * values)
+    return vector
+
+
+class MemoryIndex:
+    """Similarity search over every turn in the chat log.
+
+    Each turn is a row of a float32 matrix of l2-normalized hashed n-gram
+    vectors, added as the chat store appends it. A query is weighted by the
+    inverse document frequency of its buckets and scored against all turns at
+    once with one matrix-vector product. The matrix is saved to
+    Data/MemoryIndex.npz and turns appended since the last save are re-read
+    from the chat log on startup.
+    """
+
+    def __init__(self, store=None, path=MEMORY_PATH, dimensions=DIMENSIONS):
+        self.store = store or get_chat_store()
+        self.path = path
+        self.dimensions = dimensions
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((256, dimensions), dtype=np.float32)
+        self._document_frequency = np.zeros(dimensions, dtype=np.float32)
+        self._count = 0
+        self._saved = 0
+        self._saving = False
+        self._load()
+        self.store.add_listener(self._add)
+        # Catch up with turns appended while the index was not running
+        with self._lock:
+            self._index_until(len(self.store))
+        self._save_in_background()
+
+    def _load(self) -> None:
+        try:
+            data = np.load(self.path, allow_pickle=False)
+            matrix = data["matrix"]
+            fingerprint = str(data["fingerprint"])
+        except (FileNotFoundError, ValueError, KeyError, OSError):
+            return
+        if matrix.shape[1] != self.dimensions or len(matrix) > len(self.store) \
+                or fingerprint != self.store.fingerprint():
+            return  # Other settings, or another conversation (a chat log that was reset)
+        self._grow(len(matrix))
+        self._matrix[:len(matrix)] = matrix
+        self._document_frequency = data["document_frequency"]
+        self._count = self._saved = len(matrix)
+
+    def _grow(self, rows: int) -> None:
+        if rows > len(self._matrix):
+            matrix = np.zeros((max(rows, len(self._matrix) * 2), self.dimensions), dtype=np.float32)
+            matrix[:self._count] = self._matrix[:self._count]
+            self._matrix = matrix
+
+    def _append(self, turn: dict) -> None:
+        vector = hashed_vector(str(turn.get("content", "")), self.dimensions)
+        norm = np.linalg.norm(vector)
+        self._grow(self._count + 1)
+        if norm:
+            self._matrix[self._count] = vector / norm
+            self._document_frequency += vector != 0
+        self._count += 1
+
+    def _index_until(self, stop: int) -> None:
+        if stop > self._count:
+            for turn in self.store.read_range(self._count, stop):
+                self._append(turn)
+
+    def _add(self, seq: int, turn: dict) -> None:
+        with self._lock:
+            if seq < self._count:
+                return
+            self._index_until(seq)
+            self._append(turn)
+            due = self._count - self._saved >= SAVE_EVERY
+        if due:
+            self._save_in_background()
+
+    def search(self, query: str, k: int = RESULTS, before: int = None, min_score: float = MIN_SCORE) -> list:
+        """Return [(seq, score)] of the k turns most similar to query among turns [0, before)."""
+        vector = hashed_vector(query, self.dimensions)
+        with self._lock:
+            count = self._count if before is None else min(before, self._count)
+            if count == 0 or not vector.any():
+                return []
+            idf = np.log((1 + self._count) / (1 + self._document_frequency)) + 1
+            vector *= idf
+            scores = self._matrix[:count] @ (vector / np.linalg.norm(vector))
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(seq), float(scores[seq])) for seq in top if scores[seq] >= min_score]
+
+    def recall(self, query: str, k: int = RESULTS, before: int = None) -> list:
+        """Past exchanges relevant to query, most relevant first, as chat turns with their "seq".
+
+        A matching question comes with the answer that followed it and a
+        matching answer with the question it answered. Up to three times k
+        matches are returned, because the most similar turns are often recent
+        ones the caller already sends.
+        """
+        limit = len(self.store) if before is None else before
+        turns, seen = [], set()
+        for seq, _ in self.search(query, k * 3, before):
+            if seq in seen:
+                continue
+            first = max(0, seq - 1)
+            exchange = self.store.read_range(first, seq + 2)
+            turn = exchange[seq - first]
+            pair = (seq, seq + 1) if turn["role"] == "user" else (seq - 1, seq)
+            for other in pair:
+                if 0 <= other < limit and other - first < len(exchange) and other not in seen:
+                    seen.add(other)
+                    turns.append(dict(exchange[other - first], seq=other))
+        return turns
+
+    def save(self) -> None:
+        with self._lock:
+            matrix = self._matrix[:self._count].copy()
+            document_frequency = self._document_frequency.copy()
+        try:
+            with open(self.path + ".tmp", "wb") as file:
+                np.savez(file, matrix=matrix, document_frequency=document_frequency,
+                         fingerprint=np.array(self.store.fingerprint()))
+            os.replace(self.path + ".tmp", self.path)
+            self._saved = len(matrix)
+        except Exception as e:
+            print(f"Error saving memory index: {e}")
+
+    def _save_in_background(self) -> None:
+        with self._lock:
+            if self._saving or self._count == self._saved:
+                return
+            self._saving = True
+
+        def run():
+            try:
+                self.save()
+            finally:
+                self._saving = False
+
+        threading.Thread(target=run, name="MemoryIndexSave", daemon=True).start()
+
+
+_memory_index = None
+_memory_index_lock = threading.Lock()
+
+
+def get_memory_index() -> MemoryIndex:
+    """Return the process-wide memory index, building it from the chat log on first use."""
+    global _memory_index
+    with _memory_index_lock:
+        if _memory_index is None:
+            _memory_index = MemoryIndex()
+        return _memory_index
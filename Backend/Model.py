@@ -1,9 +1,13 @@
-import cohere
 from rich import print
 from dotenv import load_dotenv
 import os
 import sys
 
+from Backend.IntentClassifier import IntentClassifier, log_decision, normalize_query
+from Backend.Cache import PersistentTTLCache
+from Backend.FewShot import FewShotContext
+from Backend.Providers import get_cohere
+
 
 def initialize_cohere_client():
     """Initialize the Cohere client with proper error handling."""
@@ -26,7 +30,7 @@ Please ensure you have set up your API key using one of these methods:
         sys.exit(1)
 
     try:
-        client = cohere.Client(api_key=cohere_api_key)
+        client = get_cohere()
         print("[green]Successfully connected to Cohere API![/green]")
         return client
     except Exception as e:
@@ -47,7 +51,32 @@ funcs = [
     "youtube search", "reminder"
 ]
 
-messages = []
+# Local fast path that answers before the remote model when it is confident
+fast_path = IntentClassifier(funcs)
+
+# Decisions for repeated phrases, keyed on the normalized query
+decision_cache = PersistentTTLCache(
+    os.path.join("Data", "DecisionCache.json"),
+    max_entries=int(os.getenv("DecisionCacheSize", 2000)),
+    default_ttl=24 * 3600
+)
+
+# Time-sensitive decisions expire sooner than pure automation commands
+DECISION_TTLS = {
+    "realtime": 10 * 60,
+    "reminder": 10 * 60,
+    "open": 7 * 24 * 3600,
+    "system": 7 * 24 * 3600,
+}
+
+
+def decision_ttl(decision):
+    """Return the shortest TTL among the decision's tasks."""
+    return min(
+        next((ttl for prefix, ttl in DECISION_TTLS.items() if task.lower().startswith(prefix)),
+             decision_cache.default_ttl)
+        for task in decision
+    )
 
 # Define preamble
 preamble = """
@@ -87,45 +116,68 @@ ChatHistory = [
     {"role": "Chatbot", "message": "general what is today's date, reminder 11:00pm 5th aug dancing performance"}
 ]
 
+# Seed examples plus a rolling window of past decisions kept under a token budget
+few_shot = FewShotContext(
+    ChatHistory,
+    token_budget=int(os.getenv("DecisionHistoryTokens", 400)),
+    select_similar=os.getenv("DecisionExampleSelection", "recent").lower() == "similar"
+)
+
+# How often to ask again when the model echoes the "(query)" placeholder
+MAX_DECISION_RETRIES = int(os.getenv("DecisionRetries", 2))
+
 
 def FirstlayerDMM(prompt: str = "test"):
     """Process user input and determine the appropriate response type."""
+    decision = fast_path.classify(prompt)
+    if decision:
+        return decision
+
+    cache_key = normalize_query(prompt)
+    decision = decision_cache.get(cache_key)
+    if decision:
+        return decision
+
     try:
-        # Add user query to message list
-        messages.append({"role": "User", "message": prompt})
-
-        # Create chat session with user
-        stream = co.chat_stream(
-            model="command-r-plus",
-            message=prompt,
-            temperature=0.7,
-            chat_history=ChatHistory,
-            prompt_truncation="OFF",
-            connectors=[],
-            preamble=preamble
-        )
-
-        response = ""
-        for event in stream:
-            if event.event_type == "text-generation":
-                response += event.text
-
-        # Clean and process response
-        response = response.replace("\n", "")
-        response = [task.strip() for task in response.split(",")]
-
-        # Filter valid responses
-        temp = []
-        for task in response:
-            for func in funcs:
-                if task.lower().startswith(func):
-                    temp.append(task)
-
-        # Update chat history with bot's response
-        ChatHistory.append({"role": "Chatbot", "message": ", ".join(temp)})
-
-        if "(query)" in str(temp):
-            return FirstlayerDMM(prompt=prompt)
+        for attempt in range(MAX_DECISION_RETRIES + 1):
+            # Create chat session with user
+            stream = co.chat_stream(
+                model="command-r-plus",
+                message=prompt,
+                temperature=0.7,
+                chat_history=few_shot.build(prompt),
+                prompt_truncation="OFF",
+                connectors=[],
+                preamble=preamble
+            )
+
+            response = ""
+            for event in stream:
+                if event.event_type == "text-generation":
+                    response += event.text
+
+            # Clean and process response
+            response = response.replace("\n", "")
+            response = [task.strip() for task in response.split(",")]
+
+            # Filter valid responses
+            temp = []
+            for task in response:
+                for func in funcs:
+                    if task.lower().startswith(func):
+                        temp.append(task)
+
+            if "(query)" not in str(temp):
+                break
+        else:
+            # Give up on the placeholder answer rather than retrying forever
+            temp = [f"general {prompt}"]
+
+        # Remember the decision as a future few-shot example
+        few_shot.record(prompt, ", ".join(temp))
+        log_decision(prompt, temp)
+        if temp:
+            decision_cache.put(cache_key, temp, ttl=decision_ttl(temp))
         return temp
 
     except Exception as e:
@@ -141,5 +193,6 @@ if __name__ == "__main__":
             result = FirstlayerDMM(user_input)
             print(result)
     except KeyboardInterrupt:
+        print(f"[yellow]Decision cache: {decision_cache.stats()}[/yellow]")
         print("\n[yellow]Exiting...[/yellow]")
         sys.exit(0)
@@ -0,0 +1,181 @@
+from dotenv import dotenv_values
+import threading
+import asyncio
+import queue
+import time
+
+from Backend.Automation import TranslateAndExecute
+from Backend.Chatbox import chatbot
+from Backend.ImageJobs import get_image_jobs
+from Backend.Model import FirstlayerDMM
+from Backend.RealtimeSearchEngine import realtime_search_engine
+from Backend.Speculation import speculator
+from Backend.SpeechToText import speech_recognition
+from Backend.TextToSpeech import SpeechStream
+from Backend.Tracing import tracer
+
+env_vars = dotenv_values(".env")
+
+AUTOMATION_FUNCTIONS = ["open", "close", "play", "system", "content", "google search", "youtube search"]
+
+# Per-task deadlines in seconds
+TIMEOUTS = {
+    "automation": float(env_vars.get("AutomationTimeout", 90)),
+    "image": float(env_vars.get("ImageTimeout", 10)),
+    "answer": float(env_vars.get("AnswerTimeout", 60)),
+}
+
+
+class TurnPlan:
+    """The independent pieces of work contained in one FirstlayerDMM decision."""
+
+    def __init__(self, decision: list):
+        self.automation = [task for task in decision if any(task.startswith(f) for f in AUTOMATION_FUNCTIONS)]
+        self.images = [task for task in decision if "generate " in task]
+        self.answer_kind = None
+        self.answer_query = ""
+        self.exit = False
+
+        if any(task.startswith("realtime") for task in decision):
+            # General and realtime questions are answered together from fresh search results
+            self.answer_kind = "realtime"
+            self.answer_query = " and ".join(
+                " ".join(task.split()[1:]) for task in decision
+                if task.startswith("general") or task.startswith("realtime")
+            )
+            return
+
+        for task in decision:
+            if "general" in task:
+                self.answer_kind, self.answer_query = "general", task.replace("general ", "")
+                return
+            if "exit" in task:
+                self.answer_kind, self.answer_query, self.exit = "general", "Okay, Bye!", True
+                return
+
+
+class TurnOrchestrator:
+    """Run the tasks of a turn concurrently and report each one as soon as it finishes.
+
+    Automation, image generation and the spoken answer are independent, so a
+    turn takes about as long as its slowest branch instead of the sum of all.
+    """
+
+    def __init__(self, show_text, set_status, query_modifier, assistant_name):
+        self.show_text = show_text
+        self.set_status = set_status
+        self.query_modifier = query_modifier
+        self.assistant_name = assistant_name
+        self.timings = {}
+
+    def listen_and_run(self, username: str, on_decision=None) -> bool:
+        """One whole voice turn: recognize the query, start the likely answer, decide, then run the decision.
+
+        Main and the turn latency benchmark both run turns through here.
+        on_decision is called with the decision as soon as it is made.
+        Returns False when the user asked to exit; a recognizer out of input ends the turn without one.
+        """
+        with tracer.turn():
+            self.set_status("Listening...")
+            with tracer.span("speech_recognition"):
+                query = speech_recognition()
+            if query is None:
+                return True
+            self.show_text(f"{username} : {query}")
+            self.set_status("Thinking...")
+            # The likely answer starts now and is kept only if the decision agrees
+            speculation = speculator.start(self.query_modifier(query))
+            with tracer.span("FirstlayerDMM"):
+                decision = FirstlayerDMM(query)
+            if on_decision:
+                on_decision(decision)
+
+            # Automation, image generation and the answer run concurrently
+            with tracer.span("run_turn"):
+                return asyncio.run(self.run_turn(decision, speculation))
+
+    async def run_turn(self, decision: list, speculation=None) -> bool:
+        """Execute a decision list. Returns False when the user asked to exit.
+
+        speculation is the answer Speculator.start began before the decision;
+        it is adopted when the decision asks for the same answer and cancelled otherwise.
+        """
+        plan = TurnPlan(decision)
+        if speculation is not None and not speculator.resolve(speculation, plan.answer_kind, plan.answer_query):
+            speculation = None
+        branches = []
+        if plan.automation:
+            branches.append(self._branch("automation", self._automation(plan.automation)))
+        for prompt in plan.images:
+            branches.append(self._branch("image", self._image(prompt)))
+        if plan.answer_kind:
+            branches.append(self._branch("answer", self._answer(plan, speculation)))
+
+        self.timings = {}
+        await asyncio.gather(*branches)
+        return not plan.exit
+
+    async def _branch(self, name: str, work) -> None:
+        started = time.perf_counter()
+        try:
+            async with tracer.async_span(name, cat="branch"):
+                await asyncio.wait_for(work, timeout=TIMEOUTS[name])
+        except asyncio.TimeoutError:
+            print(f"{name} task timed out after {TIMEOUTS[name]:.0f}s")
+            self.set_status(f"{name.capitalize()} is taking too long, skipped ...")
+        except Exception as e:
+            print(f"Error in {name} task: {e}")
+        finally:
+            self.timings[name] = time.perf_counter() - started
+
+    async def _automation(self, commands: list) -> None:
+        # Each command reports as soon as it finishes; the slowest no longer holds back the rest
+        finished = 0
+        async for result in TranslateAndExecute(commands):
+            finished += 1
+            label = {"done": "Done", "failed": "Failed", "timeout": "Timed out"}[result.status]
+            self.set_status(f"{label}: {result.command} ({finished}/{len(commands)})")
+
+    async def _image(self, task: str) -> None:
+        # Workers in this process generate the images and report progress on the bus
+        prompt = task.replace("generate image", "", 1).strip() or task
+        try:
+            get_image_jobs().submit(prompt)
+        except queue.Full:
+            self.set_status("Too many images in progress, try again shortly ...")
+            return
+        self.set_status("Generating images ...")
+
+    async def _answer(self, plan: TurnPlan, speculation=None) -> None:
+        self.set_status("Searching ..." if plan.answer_kind == "realtime" else "Thinking ...")
+        answer_function = realtime_search_engine if plan.answer_kind == "realtime" else chatbot
+
+        # Speech starts with the first finished sentence of the stream
+        speech = SpeechStream()
+        cancelled = threading.Event()
+        stored = (None, None)
+
+        def on_stored(question_seq, answer_seq):
+            nonlocal stored
+            stored = (question_seq, answer_seq)
+
+        try:
+            if speculation is not None and speculation.kind == "general":
+                # The answer has been streaming since before the decision; pick it up where it is
+                answer = await asyncio.to_thread(speculation.adopt, speech.feed, on_stored)
+            else:
+                # A kept realtime speculation has its search results cached or in flight already
+                answer = await asyncio.to_thread(answer_function, self.query_modifier(plan.answer_query),
+                                                 on_token=speech.feed, cancelled=cancelled, on_stored=on_stored)
+            # The chat window keeps the store positions so it can page older turns back in exactly
+            self.show_text(f"{self.assistant_name} : {answer}", stored[1], stored[0])
+            self.set_status("Answering ...")
+            speech.close(answer)
+            await asyncio.to_thread(speech.wait)
+        except asyncio.CancelledError:
+            # wait_for only cancels this coroutine; the worker threads have to be told to stop
+            cancelled.set()
+            if speculation is not None:
+                speculation.cancel()
+            speech.cancel()
+            raise
@@ -0,0 +1,150 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from html.parser import HTMLParser
+from requests.compat import chardet
+from dotenv import dotenv_values
+import codecs
+import time
+import re
+
+from Backend.Providers import get_http_session
+from Backend.Tracing import tracer
+
+env_vars = dotenv_values(".env")
+
+FETCH_PAGES = int(env_vars.get("SearchFetchPages", 5))
+FETCH_TIMEOUT = float(env_vars.get("SearchFetchTimeout", 1.5))  # Per URL, connect to last byte
+FETCH_BUDGET = float(env_vars.get("SearchFetchBudget", 2.5))  # Whole stage
+SNIPPET_CHARS = int(env_vars.get("SearchSnippetChars", 600))
+MAX_PAGE_BYTES = 512 * 1024
+
+_header_charset = re.compile(r"charset=[\"']?([\w-]+)", re.IGNORECASE)
+_meta_charset = re.compile(rb"<meta[^>]+charset=[\"']?([\w-]+)", re.IGNORECASE)
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/100.0.4896.75 Safari/537.36")
+
+# Downloads are I/O bound and each worker extracts its page as soon as it arrives,
+# so extraction of one page overlaps the download of the others
+executor = ThreadPoolExecutor(max_workers=FETCH_PAGES * 2, thread_name_prefix="PageFetcher")
+
+
+class TextExtractor(HTMLParser):
+    """Collect the readable text blocks of a page, skipping scripts, menus and boilerplate."""
+
+    SKIP = {"script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg", "iframe", "button"}
+    BLOCKS = {"p", "div", "li", "td", "section", "article", "main", "h1", "h2", "h3", "h4", "br", "tr", "blockquote"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks = []
+        self._current = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip_depth += 1
+        elif tag in self.BLOCKS:
+            self._end_block()
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCKS:
+            self._end_block()
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._current.append(data)
+
+    def _end_block(self):
+        text = " ".join("".join(self._current).split())
+        self._current = []
+        # Short fragments are menu entries, buttons and captions
+        if len(text.split()) >= 8:
+            self.blocks.append(text)
+
+    def close(self):
+        super().close()
+        self._end_block()
+
+
+def page_encoding(content_type: str, body: bytes) -> str:
+    """Charset of a downloaded page: declared in the Content-Type header or a <meta> tag, else detected.
+
+    requests assumes ISO-8859-1 for HTML without a declared charset, which garbles UTF-8 pages.
+    """
+    declared = _header_charset.search(content_type)
+    declared = declared.group(1) if declared else None
+    if not declared:
+        meta = _meta_charset.search(body[:4096])
+        declared = meta.group(1).decode("ascii") if meta else None
+    if declared:
+        try:
+            return codecs.lookup(declared).name
+        except LookupError:
+            pass
+    try:
+        # The incremental decoder accepts a character cut in half by the size limit
+        codecs.getincrementaldecoder("utf-8")().decode(body)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return chardet.detect(bytes(body[:64 * 1024]))["encoding"] or "utf-8"
+
+
+def extract_text(html: str) -> list:
+    """Return the main text blocks of an HTML document in page order."""
+    parser = TextExtractor()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        pass  # Keep whatever was parsed before the markup broke
+    return parser.blocks
+
+
+def make_snippet(blocks: list, query: str, limit=SNIPPET_CHARS) -> str:
+    """Pick the blocks that mention the most query words, in page order, up to limit characters."""
+    terms = set(re.findall(r"\w+", query.lower()))
+    ranked = sorted(range(len(blocks)),
+                    key=lambda i: (-len(terms & set(re.findall(r"\w+", blocks[i].lower()))), i))
+    chosen, used = [], 0
+    for i in ranked:
+        if used >= limit:
+            break
+        chosen.append(i)
+        used += len(blocks[i]) + 1
+    snippet = " ".join(blocks[i] for i in sorted(chosen))
+    return snippet[:limit].rsplit(" ", 1)[0] + " ..." if len(snippet) > limit else snippet
+
+
+@tracer.traced()
+def fetch_page(url: str, query: str, deadline: float):
+    """Download one page within its deadline and return its snippet, or None."""
+    started = time.monotonic()
+    try:
+        # The shared session keeps connections alive across searches
+        with get_http_session().get(url, headers={"User-Agent": USER_AGENT}, timeout=FETCH_TIMEOUT,
+                                    stream=True) as response:
+            if response.status_code != 200 or "html" not in response.headers.get("Content-Type", ""):
+                return None
+            body = bytearray()
+            for chunk in response.iter_content(16 * 1024):
+                body += chunk
+                # requests only bounds each socket read, so enforce the total here
+                if len(body) >= MAX_PAGE_BYTES or time.monotonic() - started > FETCH_TIMEOUT \
+                        or time.monotonic() > deadline:
+                    break
+            html = body.decode(page_encoding(response.headers.get("Content-Type", ""), body), errors="replace")
+    except Exception:
+        return None
+    return make_snippet(extract_text(html), query) or None
+
+
+@tracer.traced()
+def fetch_snippets(urls: list, query: str, budget=FETCH_BUDGET) -> dict:
+    """Fetch urls concurrently and return {url: snippet} for the pages that finished within budget."""
+    deadline = time.monotonic() + budget
+    futures = {executor.submit(tracer.bind(fetch_page), url, query, deadline): url for url in urls[:FETCH_PAGES]}
+    done, _ = wait(futures, timeout=budget)
+    # Slow hosts are dropped; their workers give up at the per-URL deadline
+    return {futures[future]: future.result() for future in done if future.result()}
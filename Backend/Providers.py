@@ -0,0 +1,112 @@
+from requests.adapters import HTTPAdapter
+from dotenv import dotenv_values
+import threading
+import requests
+import httpx
+import os
+
+env_vars = dotenv_values(".env")
+
+POOL_SIZE = int(env_vars.get("ProviderPoolSize", 10))
+TIMEOUT = float(env_vars.get("ProviderTimeout", 30))
+CONNECT_TIMEOUT = float(env_vars.get("ProviderConnectTimeout", 5))
+KEEPALIVE_SECONDS = float(env_vars.get("ProviderKeepAlive", 120))
+
+# Hosts whose connections are opened ahead of the first request
+WARM_UP_URLS = {
+    "groq": "https://api.groq.com",
+    "cohere": "https://api.cohere.com",
+    "http": "https://api-inference.huggingface.co",
+}
+
+_clients = {}
+_connections = {}  # name -> the httpx client or requests session carrying its traffic
+_lock = threading.Lock()
+
+
+class TimeoutSession(requests.Session):
+    """A requests session whose requests give up after the provider timeouts unless they pass their own."""
+
+    def request(self, method, url, **kwargs):
+        # requests waits forever by default; a stalled host would hold its worker indefinitely
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = (CONNECT_TIMEOUT, TIMEOUT)
+        return super().request(method, url, **kwargs)
+
+
+def _env(*names):
+    return next((env_vars.get(name) or os.getenv(name) for name in names
+                 if env_vars.get(name) or os.getenv(name)), None)
+
+
+def _httpx_client() -> httpx.Client:
+    return httpx.Client(
+        limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE,
+                            keepalive_expiry=KEEPALIVE_SECONDS),
+        timeout=httpx.Timeout(TIMEOUT, connect=CONNECT_TIMEOUT)
+    )
+
+
+def _create(name):
+    if name == "groq":
+        from groq import Groq
+        _connections[name] = _httpx_client()
+        return Groq(api_key=_env("GROQ_API_KEY"), http_client=_connections[name])
+    if name == "cohere":
+        import cohere
+        _connections[name] = _httpx_client()
+        return cohere.Client(api_key=_env("CohereAPIkey", "COHERE_API_KEY", "CO_API_KEY"),
+                             timeout=TIMEOUT, httpx_client=_connections[name])
+    session = _connections[name] = TimeoutSession()
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _get(name):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = _create(name)
+    return client
+
+
+def get_groq():
+    """The process-wide Groq client; its connections are shared by every backend module."""
+    return _get("groq")
+
+
+def get_cohere():
+    """The process-wide Cohere client."""
+    return _get("cohere")
+
+
+def get_http_session() -> requests.Session:
+    """The process-wide requests session for plain HTTP APIs and web pages."""
+    return _get("http")
+
+
+def _open_connection(name):
+    try:
+        _get(name)
+        # Any response will do: the point is the TLS connection left in the pool
+        _connections[name].head(WARM_UP_URLS[name], timeout=CONNECT_TIMEOUT)
+    except Exception as e:
+        print(f"Error warming up {name} connection: {e}")
+
+
+def warm_up(names=("groq", "cohere", "http")) -> threading.Thread:
+    """Create the clients and open their connections in the background."""
+    def run():
+        threads = [threading.Thread(target=_open_connection, args=(name,), daemon=True) for name in names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
@@ -1,11 +1,17 @@
 from googlesearch import search
-from groq import Groq
-from json import load, dump
 import datetime
 import os
 import sys
 from dotenv import load_dotenv
 
+from Backend.ChatStore import get_chat_store
+from Backend.ContextBuilder import get_context_builder
+from Backend.Providers import get_groq
+from Backend.Cache import PersistentTTLCache, SingleFlight
+from Backend.IntentClassifier import normalize_query
+from Backend.PageFetcher import fetch_snippets, FETCH_PAGES
+from Backend.Tracing import tracer
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -31,7 +37,7 @@ except Exception as e:
 
 # Initialize Groq client with error handling
 try:
-    client = Groq(api_key=GROQ_API_KEY)
+    client = get_groq()
 except Exception as e:
     print(f"Error initializing Groq client: {e}")
     sys.exit(1)
@@ -75,28 +81,53 @@ For {USERNAME}:
 Think of yourself as a helpful friend who's both smart and easy to talk to."""
 
 
-def initialize_chat_log():
-    try:
-        with open(r"Data\ChatLog.json", "r") as f:
-            return load(f)
-    except FileNotFoundError:
-        with open(r"Data\ChatLog.json", "w") as f:
-            dump([], f)
-            return []
-    except json.JSONDecodeError:
-        print("Error: ChatLog.json is corrupted. Creating new empty log.")
-        with open(r"Data\ChatLog.json", "w") as f:
-            dump([], f)
-            return []
+# Search results for repeated questions, keyed on the normalized query
+search_cache = PersistentTTLCache(
+    os.path.join("Data", "SearchCache.json"),
+    max_entries=int(os.getenv("SearchCacheSize", 500)),
+    default_ttl=24 * 3600
+)
+# Identical searches that are already running share one upstream call
+search_flights = SingleFlight()
+
+# Results about fast-moving topics expire sooner; the first matching class wins
+SEARCH_TTLS = [
+    ({"score", "live", "match", "vs"}, 2 * 60),
+    ({"weather", "temperature", "stock", "stocks", "price", "rate", "traffic"}, 15 * 60),
+    ({"news", "today", "latest", "current", "now", "tonight", "tomorrow"}, 30 * 60),
+]
+
+
+def search_ttl(key):
+    words = set(key.split())
+    return next((ttl for terms, ttl in SEARCH_TTLS if words & terms), search_cache.default_ttl)
 
 
+def fetch_results(query, key):
+    """Search upstream and cache the [url, snippet] pairs."""
+    # Fixed: Handle search results properly based on the actual structure
+    with tracer.span("googlesearch"):
+        urls = list(search(query, num_results=FETCH_PAGES))
+    # Page text gives the model something to ground its answer on
+    snippets = fetch_snippets(urls, query)
+    results = [[url, snippets.get(url)] for url in urls]
+    if results:
+        search_cache.put(key, results, ttl=search_ttl(key))
+    return results
+
+
+@tracer.traced()
 def google_search(query):
     try:
-        # Fixed: Handle search results properly based on the actual structure
-        results = list(search(query, num_results=5))
+        key = normalize_query(query)
+        results = search_cache.get(key)
+        if results is None:
+            results = search_flights.do(key, lambda: fetch_results(query, key))
         answer = f"The search results for {query} are:\n[start]\n"
-        for url in results:
+        for url, snippet in results:
             answer += f"URL: {url}\n"
+            if snippet:
+                answer += f"Content: {snippet}\n"
         answer += "[end]"
         return answer
     except Exception as e:
@@ -131,43 +162,57 @@ SYSTEM_CHATBOX = [
 ]
 
 
-def realtime_search_engine(prompt):
-    messages = initialize_chat_log()
-    messages.append({"role": "user", "content": prompt})
+def realtime_search_engine(prompt, on_token=None, cancelled=None, on_stored=None):
+    """Answer prompt from fresh search results; on_token receives streamed chunks.
 
-    search_results = google_search(prompt)
-    SYSTEM_CHATBOX.append({"role": "system", "content": search_results})
+    The question is stored together with its answer (or error reply); setting the cancelled
+    event ends the stream early, and the exchange is then not stored at all.
+    on_stored is called with the chat store seqs of the question and the answer once both are stored.
+    """
+    chat_store = get_chat_store()
 
     try:
-        completion = client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=SYSTEM_CHATBOX + [
-                {"role": "system", "content": format_time_info(get_current_time_info())}] + messages,
-            max_tokens=1024,
-            temperature=0.7,
-            top_p=1,
-            stream=True,
-            stop=None
-        )
-
-        answer = ""
-        for chunk in completion:
-            if chunk.choices[0].delta.content:
-                answer += chunk.choices[0].delta.content
+        search_results = google_search(prompt)
+        # Search evidence and recent turns are cut to the token budget; older turns are summarized
+        messages = get_context_builder().build(SYSTEM_CHATBOX, time_info=format_time_info(get_current_time_info()),
+                                               evidence=search_results, pending={"role": "user", "content": prompt})
+
+        with tracer.span("groq stream"):
+            completion = client.chat.completions.create(
+                model="llama3-70b-8192",
+                messages=messages,
+                max_tokens=1024,
+                temperature=0.7,
+                top_p=1,
+                stream=True,
+                stop=None
+            )
+
+            answer = ""
+            for chunk in completion:
+                if cancelled is not None and cancelled.is_set():
+                    getattr(completion, "close", lambda: None)()
+                    return answer.strip().replace("<s>", "")
+                if chunk.choices[0].delta.content:
+                    if not answer:
+                        tracer.instant("first token")
+                    answer += chunk.choices[0].delta.content
+                    if on_token:
+                        on_token(chunk.choices[0].delta.content.replace("<s>", ""))
 
         answer = answer.strip().replace("<s>", "")
-        messages.append({"role": "assistant", "content": answer})
-
-        with open(r"Data\ChatLog.json", "w") as f:
-            dump(messages, f, indent=4)
-
-        SYSTEM_CHATBOX.pop()
+        stored = chat_store.append_exchange(prompt, answer)
+        if on_stored:
+            on_stored(*stored)
         return answer.strip()
 
     except Exception as e:
         print(f"Error generating response: {e}")
-        SYSTEM_CHATBOX.pop()
-        return "Error: Unable to generate response"
+        error_message = "Error: Unable to generate response"
+        stored = chat_store.append_exchange(prompt, error_message)
+        if on_stored:
+            on_stored(*stored)
+        return error_message
 
 
 if __name__ == "__main__":
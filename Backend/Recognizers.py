@@ -0,0 +1,283 @@
+from abc import ABC, abstractmethod
+from dotenv import dotenv_values
+import numpy as np
+import glob
+import time
+import wave
+import sys
+import io
+import os
+
+env_vars = dotenv_values(".env")
+
+SAMPLE_RATE = 16000
+FRAME_MS = 20
+END_SILENCE_MS = int(env_vars.get("SpeechEndSilenceMs", 500))
+
+
+class Recognizer(ABC):
+    """Source of recognized utterances for speech_recognition()."""
+
+    @abstractmethod
+    def listen(self) -> str:
+        """Block until the next utterance and return its raw transcript, or None when the source has run out."""
+
+    def close(self) -> None:
+        pass
+
+
+def detect_speech(frames: np.ndarray, threshold: float, zcr_threshold: float = 0.25):
+    """Vectorized voice-activity flags (and frame energies) for a (frames, samples) block of int16 PCM.
+
+    Voiced speech has high energy; unvoiced consonants have moderate energy
+    but a high zero-crossing rate, so both count as speech.
+    """
+    samples = frames.astype(np.float32) / 32768.0
+    energy = np.sqrt(np.mean(samples * samples, axis=1))
+    signs = np.signbit(samples)
+    zero_crossings = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+    return (energy > threshold) | ((energy > threshold / 2) & (zero_crossings > zcr_threshold)), energy
+
+
+class Utterance:
+    """PCM of one endpointed utterance plus the timestamps needed to measure latency."""
+
+    def __init__(self, pcm, sample_rate, speech_end_seconds, endpointed_at, source=None):
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.speech_end_seconds = speech_end_seconds  # Position in the stream where speech stopped
+        self.endpointed_at = endpointed_at  # perf_counter() when the end was detected
+        self.source = source
+
+    def wav_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as file:
+            file.setnchannels(1)
+            file.setsampwidth(2)
+            file.setframerate(self.sample_rate)
+            file.writeframes(self.pcm.astype(np.int16).tobytes())
+        return buffer.getvalue()
+
+
+class CapturePipeline:
+    """Frames PCM blocks into a ring buffer and endpoints utterances with energy/ZCR VAD."""
+
+    def __init__(self, sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS, buffer_seconds=30,
+                 end_silence_ms=END_SILENCE_MS, min_speech_ms=200, pre_roll_ms=300):
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.capacity = buffer_seconds * 1000 // frame_ms
+        self.end_silence_frames = max(1, end_silence_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.pre_roll_frames = pre_roll_ms // frame_ms
+        self.ring = np.zeros((self.capacity, self.frame_samples), dtype=np.int16)
+        self.written = 0
+        self.noise_floor = 0.005
+
+    def _write(self, frames: np.ndarray) -> None:
+        self.ring[(self.written + np.arange(len(frames))) % self.capacity] = frames
+        self.written += len(frames)
+
+    def _read(self, start: int, stop: int) -> np.ndarray:
+        # Never before the first frame written (speech right at the start) or past what the ring still holds
+        start = max(start, 0, stop - self.capacity)
+        return self.ring[np.arange(start, stop) % self.capacity].ravel()
+
+    def process(self, blocks, source=None):
+        """Consume int16 sample blocks until an utterance ends; return it, or None if the input ran out."""
+        remainder = np.zeros(0, dtype=np.int16)
+        speech_start = None
+        speech_frames = 0
+        silent_frames = 0
+
+        for block in blocks:
+            samples = np.concatenate((remainder, np.asarray(block, dtype=np.int16).ravel()))
+            count = len(samples) // self.frame_samples
+            remainder = samples[count * self.frame_samples:]
+            if count == 0:
+                continue
+
+            first = self.written
+            frames = samples[:count * self.frame_samples].reshape(count, self.frame_samples)
+            self._write(frames)
+            flags, energy = detect_speech(frames, threshold=max(0.01, self.noise_floor * 3))
+
+            # Track the background level while nobody is talking
+            if speech_start is None and not flags.any():
+                self.noise_floor = 0.9 * self.noise_floor + 0.1 * float(np.median(energy))
+
+            for offset, is_speech in enumerate(flags):
+                position = first + offset
+                if is_speech:
+                    if speech_start is None:
+                        speech_start = position
+                        speech_frames = 0
+                    speech_frames += 1
+                    silent_frames = 0
+                elif speech_start is not None:
+                    silent_frames += 1
+                    if silent_frames < self.end_silence_frames:
+                        continue
+                    if speech_frames < self.min_speech_frames:
+                        # A click or a cough, not an utterance
+                        speech_start = None
+                        continue
+                    speech_end = position - silent_frames + 1
+                    return Utterance(
+                        self._read(speech_start - self.pre_roll_frames, speech_end),
+                        self.sample_rate,
+                        speech_end * self.frame_samples / self.sample_rate,
+                        time.perf_counter(),
+                        source
+                    )
+
+        if speech_start is not None and speech_frames >= self.min_speech_frames:
+            return Utterance(self._read(speech_start - self.pre_roll_frames, self.written), self.sample_rate,
+                             self.written * self.frame_samples / self.sample_rate, time.perf_counter(), source)
+        return None
+
+
+class GroqWhisperTranscriber:
+    """Transcribe endpointed audio with Groq's hosted Whisper model."""
+
+    def __init__(self, model="whisper-large-v3", language=None):
+        self.model = model
+        self.language = language[:2].lower() if language else None  # Whisper expects ISO-639-1
+        self._client = None
+
+    def transcribe(self, utterance: Utterance) -> str:
+        if self._client is None:
+            from groq import Groq
+            self._client = Groq(api_key=env_vars.get("GROQ_API_KEY"))
+        result = self._client.audio.transcriptions.create(
+            file=("speech.wav", utterance.wav_bytes()),
+            model=self.model,
+            language=self.language
+        )
+        return result.text
+
+
+class SidecarTranscriber:
+    """Return the transcript stored next to a replayed WAV file (speech.wav -> speech.txt)."""
+
+    def transcribe(self, utterance: Utterance) -> str:
+        with open(os.path.splitext(utterance.source)[0] + ".txt", "r", encoding="utf-8") as file:
+            return file.read().strip()
+
+
+def wav_blocks(path: str, block_ms=FRAME_MS * 5, realtime=False):
+    """Yield int16 sample blocks from a 16-bit WAV file, optionally paced like a live microphone."""
+    with wave.open(path, "rb") as file:
+        if file.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        channels = file.getnchannels()
+        rate = file.getframerate()
+        block_frames = rate * block_ms // 1000
+        started = time.perf_counter()
+        sent = 0
+        while True:
+            data = file.readframes(block_frames)
+            if not data:
+                break
+            samples = np.frombuffer(data, dtype=np.int16)
+            if channels > 1:
+                samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+            if rate != SAMPLE_RATE:
+                positions = np.arange(0, len(samples), rate / SAMPLE_RATE)
+                samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.int16)
+            sent += block_ms / 1000
+            if realtime:
+                time.sleep(max(0.0, started + sent - time.perf_counter()))
+            yield samples
+        # Trailing silence so the endpointer can close the last utterance
+        yield np.zeros(SAMPLE_RATE * END_SILENCE_MS // 1000 + SAMPLE_RATE // 10, dtype=np.int16)
+
+
+class NativeRecognizer(Recognizer):
+    """Capture from the default microphone with sounddevice and endpoint locally."""
+
+    def __init__(self, transcriber=None, language=None):
+        # Only needed for live capture, so imported here rather than at module level
+        import sounddevice
+        import queue
+        self.transcriber = transcriber or GroqWhisperTranscriber(language=language)
+        self.pipeline = CapturePipeline()
+        self._blocks = queue.Queue()
+        self._stream = sounddevice.InputStream(
+            samplerate=SAMPLE_RATE, channels=1, dtype="int16",
+            blocksize=self.pipeline.frame_samples,
+            callback=lambda data, frames, timing, status: self._blocks.put(data[:, 0].copy())
+        )
+        self._stream.start()
+
+    def _live_blocks(self):
+        while True:
+            yield self._blocks.get()
+
+    def listen(self) -> str:
+        # Drop audio captured while the assistant was busy
+        while not self._blocks.empty():
+            self._blocks.get_nowait()
+        while True:
+            utterance = self.pipeline.process(self._live_blocks())
+            text = self.transcriber.transcribe(utterance).strip()
+            if text:
+                return text
+
+    def close(self) -> None:
+        self._stream.close()
+
+
+class ReplayRecognizer(Recognizer):
+    """Feed WAV files through the capture pipeline, one utterance per listen() call.
+
+    Used to benchmark endpointing and time-to-transcript deterministically on
+    machines without a microphone. Latency samples are kept in `timings`.
+    """
+
+    def __init__(self, paths, transcriber=None, realtime=False):
+        self.paths = list(paths)
+        self.transcriber = transcriber or SidecarTranscriber()
+        self.realtime = realtime
+        self.timings = []
+        self._next = 0
+
+    def listen(self) -> str:
+        if self._next >= len(self.paths):
+            return None
+        path = self.paths[self._next]
+        self._next += 1
+
+        pipeline = CapturePipeline()
+        started = time.perf_counter()
+        utterance = pipeline.process(wav_blocks(path, realtime=self.realtime), source=path)
+        if utterance is None:
+            return ""
+        text = self.transcriber.transcribe(utterance)
+        finished = time.perf_counter()
+        self.timings.append({
+            "path": path,
+            "speech_end_seconds": utterance.speech_end_seconds,
+            "endpoint_seconds": utterance.endpointed_at - started,
+            "transcript_seconds": finished - started,
+            "endpoint_to_transcript_seconds": finished - utterance.endpointed_at,
+        })
+        return text
+
+
+def replay_paths(location: str) -> list:
+    """Expand a WAV file or a directory of WAV files into a sorted list of paths."""
+    if os.path.isdir(location):
+        return sorted(glob.glob(os.path.join(location, "*.wav")))
+    return [location]
+
+
+if __name__ == "__main__":
+    # python -m Backend.Recognizers <wav file or directory>
+    recognizer = ReplayRecognizer(replay_paths(sys.argv[1]), realtime="--realtime" in sys.argv)
+    for _ in recognizer.paths:
+        print(recognizer.listen())
+    for timing in recognizer.timings:
+        print(f"{os.path.basename(timing['path'])}: speech ended at {timing['speech_end_seconds']:.2f}s, "
+              f"endpoint after {timing['endpoint_seconds'] * 1000:.1f} ms, "
+              f"transcript after {timing['transcript_seconds'] * 1000:.1f} ms")
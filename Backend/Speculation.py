@@ -0,0 +1,156 @@
+from dotenv import dotenv_values
+import threading
+import time
+
+from Backend.Chatbox import chatbot
+from Backend.ChatStore import get_chat_store
+from Backend.IntentClassifier import normalize_query
+from Backend.Model import fast_path
+from Backend.RealtimeSearchEngine import google_search
+from Backend.Tokens import count_tokens
+from Backend.Tracing import tracer
+
+env_vars = dotenv_values(".env")
+
+SPECULATION = env_vars.get("Speculation", "False") == "True"
+THRESHOLD = float(env_vars.get("SpeculationThreshold", 0.5))
+
+
+class Speculation:
+    """Answer work started on a local guess while the decision model is still running.
+
+    A general guess streams a chatbot answer into a buffer without storing the
+    exchange; a realtime guess runs the search, whose results land in the
+    search cache (or are joined while still in flight) when the real answer
+    asks for them.
+    """
+
+    def __init__(self, speculator, kind: str, query: str, probability: float):
+        self.speculator = speculator
+        self.kind = kind
+        self.query = query
+        self.probability = probability
+        self.started = time.perf_counter()
+        self.cancelled = threading.Event()
+        self.answer = None
+        self._tokens = []
+        self._on_token = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        threading.Thread(target=tracer.bind(self._run), name=f"Speculation-{kind}", daemon=True).start()
+
+    def _run(self) -> None:
+        try:
+            with tracer.span(f"speculative {self.kind}", cat="speculation"):
+                if self.kind == "general":
+                    self.answer = chatbot(self.query, on_token=self._token, record=False, cancelled=self.cancelled)
+                else:
+                    google_search(self.query)
+        except Exception as e:
+            print(f"Error in speculative {self.kind} work: {e}")
+        finally:
+            with self._lock:
+                self._done.set()
+                wasted = self.cancelled.is_set()
+            if wasted:
+                self._record_waste()
+
+    def _token(self, token: str) -> None:
+        with self._lock:
+            self._tokens.append(token)
+            if self._on_token:
+                self._on_token(token)
+
+    def matches(self, kind: str, query: str) -> bool:
+        """Whether the decision asks for the same work: same kind of answer to the same question."""
+        return kind == self.kind and normalize_query(query) == normalize_query(self.query)
+
+    def adopt(self, on_token, on_stored=None) -> str:
+        """Take over a general answer: replay what was streamed so far, follow the rest, then store the exchange.
+
+        on_stored is called with the chat store seqs of the question and the answer, as chatbot does.
+        """
+        with self._lock:
+            # Replayed under the lock so later tokens cannot overtake buffered ones
+            for token in self._tokens:
+                on_token(token)
+            self._on_token = on_token
+        self._done.wait()
+        if self.cancelled.is_set():
+            # The turn gave up on the answer; it is not stored
+            return self.answer
+        chat_store = get_chat_store()
+        stored = chat_store.append_exchange(self.query, self.answer)
+        if on_stored:
+            on_stored(*stored)
+        return self.answer
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled.set()
+            # Otherwise the work is still running and counts its waste when it stops
+            wasted = self._done.is_set()
+        if wasted:
+            self._record_waste()
+
+    def _record_waste(self) -> None:
+        with self._lock:
+            text = "".join(self._tokens)
+        self.speculator.record_waste(self.kind, count_tokens(text))
+
+
+class Speculator:
+    """Starts speculative answers and keeps count of how well they pay off."""
+
+    def __init__(self, classifier=fast_path, enabled=SPECULATION, threshold=THRESHOLD):
+        self.classifier = classifier
+        self.enabled = enabled
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._stats = {"started": 0, "skipped": 0, "hits": 0, "misses": 0, "wasted_tokens": 0,
+                       "wasted_searches": 0, "head_start": 0.0}
+
+    def start(self, query: str):
+        """Start the most likely answer for query, or return None when speculation is off or the guess is weak."""
+        if not self.enabled:
+            return None
+        guess = self.classifier.guess(query)
+        if guess is None or guess[0] not in ("general", "realtime") or guess[1] < self.threshold:
+            self._count("skipped")
+            return None
+        self._count("started")
+        return Speculation(self, guess[0], query, guess[1])
+
+    def resolve(self, speculation: Speculation, kind: str, query: str) -> bool:
+        """Keep the speculation if the decision agrees with it, otherwise cancel it. Returns whether it was kept."""
+        if speculation.matches(kind, query):
+            with self._lock:
+                self._stats["hits"] += 1
+                # Time the answer had been running when the decision came in
+                self._stats["head_start"] += time.perf_counter() - speculation.started
+            return True
+        speculation.cancel()
+        self._count("misses")
+        return False
+
+    def record_waste(self, kind: str, tokens: int) -> None:
+        with self._lock:
+            if kind == "general":
+                self._stats["wasted_tokens"] += tokens
+            else:
+                self._stats["wasted_searches"] += 1
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        resolved = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / resolved if resolved else 0.0
+        stats["head_start"] = stats["head_start"] / stats["hits"] if stats["hits"] else 0.0
+        return stats
+
+
+speculator = Speculator()
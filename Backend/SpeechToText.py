@@ -1,16 +1,23 @@
 from selenium import webdriver
 from selenium.webdriver.common.by import By
+from selenium.common.exceptions import TimeoutException, JavascriptException, SessionNotCreatedException
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 from dotenv import dotenv_values
+import threading
 import os
 import mtranslate as mt
 
+from Backend.EventBus import bus, MIC, STATUS
+from Backend.Recognizers import Recognizer, NativeRecognizer, ReplayRecognizer, replay_paths
+
 # Load environment variables from the .env file.
 env_vars = dotenv_values(".env")
 # Get the input language setting from the environment variables.
 InputLanguage = env_vars.get("InputLanguage")
+# Get the recognizer backend: browser (default), native or replay.
+SpeechBackend = env_vars.get("SpeechBackend", "browser").lower()
 
 # Define the HTML code for the speech recognition interface.
 HtmlCode = '''<!DOCTYPE html>
@@ -24,25 +31,71 @@ HtmlCode = '''<!DOCTYPE html>
     <p id="output"></p>
     <script>
         const output = document.getElementById('output');
+        const events = [];
         let recognition;
+        let listening = false;
+        let waiter = null;
 
-        function startRecognition() {
-            recognition = new webkitSpeechRecognition() || new SpeechRecognition();
-            recognition.lang = '';
-            recognition.continuous = true;
+        // Hand a result to Python right away if it is waiting, otherwise queue it.
+        function pushEvent(event) {
+            if (waiter) {
+                const callback = waiter;
+                waiter = null;
+                callback(event);
+            } else {
+                events.push(event);
+            }
+        }
 
-            recognition.onresult = function(event) {
-                const transcript = event.results[event.results.length - 1][0].transcript;
-                output.textContent += transcript;
+        // Called through execute_async_script; resolves with the next result, or null after timeoutMs.
+        // Giving up here, before the script timeout, means a result never goes to a callback Python stopped waiting on.
+        function nextEvent(callback, timeoutMs) {
+            if (events.length) {
+                callback(events.shift());
+                return;
+            }
+            const timer = setTimeout(function() {
+                waiter = null;
+                callback(null);
+            }, timeoutMs);
+            waiter = function(event) {
+                clearTimeout(timer);
+                callback(event);
             };
+        }
 
-            recognition.onend = function() {
-                recognition.start();
-            };
+        function startRecognition() {
+            events.length = 0;
+            if (!recognition) {
+                recognition = new webkitSpeechRecognition() || new SpeechRecognition();
+                recognition.lang = '';
+                recognition.continuous = true;
+                recognition.interimResults = true;
+
+                recognition.onresult = function(event) {
+                    for (let i = event.resultIndex; i < event.results.length; i++) {
+                        const transcript = event.results[i][0].transcript;
+                        if (event.results[i].isFinal) {
+                            output.textContent += transcript;
+                            pushEvent({type: 'final', text: transcript});
+                        } else {
+                            pushEvent({type: 'interim', text: transcript});
+                        }
+                    }
+                };
+
+                recognition.onend = function() {
+                    if (listening) {
+                        recognition.start();
+                    }
+                };
+            }
+            listening = true;
             recognition.start();
         }
 
         function stopRecognition() {
+            listening = false;
             recognition.stop();
             output.innerHTML = "";
         }
@@ -69,17 +122,41 @@ chrome_options.add_argument(f'user-agent={user_agent}')
 chrome_options.add_argument("--use-fake-ui-for-media-stream")
 chrome_options.add_argument("--use-fake-device-for-media-stream")
 #chrome_options.add_argument("--headless=new")
-# Initialize the Chrome WebDriver using the ChromeDriverManager.
-service = Service(ChromeDriverManager().install())
-driver = webdriver.Chrome(service=service, options=chrome_options)
+
+
+# File remembering where ChromeDriverManager put the driver, so startup skips its network check.
+DriverPathFile = os.path.join("Data", "ChromeDriverPath.txt")
+
+
+# Function to find chromedriver, resolving it online only when the cached path is unusable.
+def GetDriverPath(refresh=False):
+    if not refresh and os.path.exists(DriverPathFile):
+        with open(DriverPathFile, "r") as f:
+            path = f.read().strip()
+        if os.path.exists(path):
+            return path
+
+    path = ChromeDriverManager().install()
+    with open(DriverPathFile, "w") as f:
+        f.write(path)
+    return path
+
+
+# Function to start Chrome; only the browser recognizer needs it.
+def StartBrowser():
+    try:
+        return webdriver.Chrome(service=Service(GetDriverPath()), options=chrome_options)
+    except SessionNotCreatedException:
+        # Chrome was updated past the cached driver; fetch the matching one.
+        return webdriver.Chrome(service=Service(GetDriverPath(refresh=True)), options=chrome_options)
+
 
 # Define the path for temporary files.
 TempDirPath = rf"{current_dir}/Frontend/Files"
 
-# Function to set the assistant's status by writing it to a file.
+# Function to set the assistant's status by publishing it on the event bus.
 def SetAssistantStatus(Status):
-    with open(rf'{TempDirPath}/Status.data', "w", encoding='utf-8') as file:
-        file.write(Status)
+    bus.publish(STATUS, str(Status))
 
 # Function to modify a query to ensure proper punctuation and formatting.
 def QueryModifier(Query):
@@ -109,32 +186,111 @@ def UniversalTranslator(Text):
     return english_translation.capitalize()
 
 
-# Function to perform speech recognition using the WebDriver.
-def speech_recognition():
-    # Open the HTML file in the browser.
-    driver.get("file:///" + Link)
-    # Start speech recognition by clicking the start button.
-    driver.find_element(by=By.ID, value="start").click()
+# How long a single wait for a recognition result may block inside the browser.
+EventWaitSeconds = 300
 
-    while True:
+
+class BrowserRecognizer(Recognizer):
+    """Chrome's webkitSpeechRecognition; results are pushed from the page."""
+
+    def __init__(self):
+        self.driver = StartBrowser()
+        self.page_loaded = False
+
+    # Load the recognition page once and keep it warm between utterances.
+    def LoadRecognitionPage(self):
+        if not self.page_loaded:
+            self.driver.get("file:///" + Link)
+            self.driver.set_script_timeout(EventWaitSeconds)
+            self.page_loaded = True
+
+    # Start speech recognition on the loaded page, reloading it if it crashed since the last turn.
+    def StartRecognition(self):
+        self.LoadRecognitionPage()
+        try:
+            self.driver.execute_script("startRecognition();")
+        except JavascriptException:
+            self.page_loaded = False
+            self.LoadRecognitionPage()
+            self.driver.execute_script("startRecognition();")
+
+    # Block until the page pushes the next recognition result; None when nobody spoke for a while.
+    def NextRecognitionEvent(self):
         try:
-            # Get the recognized text from the HTML output element.
-            Text = driver.find_element(by=By.ID, value="output").text
+            # The page gives up a few seconds before the script timeout would
+            return self.driver.execute_async_script("nextEvent(arguments[arguments.length - 1], arguments[0]);",
+                                                    (EventWaitSeconds - 5) * 1000)
+        except TimeoutException:
+            # Drop the callback Selenium stopped waiting on, or the next result would be handed to it and lost.
+            self.driver.execute_script("waiter = null;")
+            return None
+
+    def listen(self):
+        self.StartRecognition()
+
+        while True:
+            try:
+                event = self.NextRecognitionEvent()
+            except JavascriptException:
+                # The page was reloaded or crashed; load it again and keep listening.
+                self.page_loaded = False
+                self.StartRecognition()
+                continue
+
+            if not event or not event["text"].strip():
+                continue
+
+            if event["type"] == "interim":
+                # Show what has been heard so far while the user is still speaking.
+                SetAssistantStatus(f"Listening... {event['text'].strip()}")
+                continue
 
-            if Text:
-                # Stop recognition by clicking the stop button.
-                driver.find_element(by=By.ID, value="end").click()
+            # Stop recognition until the next utterance is requested.
+            self.driver.execute_script("stopRecognition();")
+            return event["text"].strip()
 
-                # If the input language is English, return the modified query.
-                if InputLanguage.lower() == "en" or "en" in InputLanguage.lower():
-                    return QueryModifier(Text)
-                else:
-                    # If the input language is not English, translate the text and return it.
-                    SetAssistantStatus("Translating...")
-                    return QueryModifier(UniversalTranslator(Text))
+    def close(self):
+        self.driver.quit()
 
-        except Exception as e:
-            pass
+
+recognizer = None
+recognizer_lock = threading.Lock()
+
+
+# Function to create the configured recognizer on first use (startup may pre-create it).
+def GetRecognizer():
+    global recognizer
+    with recognizer_lock:
+        if recognizer is not None:
+            return recognizer
+        if SpeechBackend == "native":
+            recognizer = NativeRecognizer(language=InputLanguage)
+        elif SpeechBackend == "replay":
+            recognizer = ReplayRecognizer(replay_paths(env_vars.get("SpeechReplayPath", os.path.join("Data", "Replay"))))
+        else:
+            recognizer = BrowserRecognizer()
+    return recognizer
+
+
+# Function to perform speech recognition with the configured recognizer.
+# Returns None when the recognizer has run out of input (a finished replay).
+def speech_recognition():
+    Text = ""
+    while not Text:
+        Text = GetRecognizer().listen()
+        if Text is None:
+            # Switch the microphone off so the main loop waits instead of asking again
+            print("Speech replay finished, no more recordings")
+            bus.publish(MIC, False)
+            return None
+
+    # If the input language is English, return the modified query.
+    if InputLanguage.lower() == "en" or "en" in InputLanguage.lower():
+        return QueryModifier(Text)
+    else:
+        # If the input language is not English, translate the text and return it.
+        SetAssistantStatus("Translating...")
+        return QueryModifier(UniversalTranslator(Text))
 
 
 # Main execution block.
@@ -142,4 +298,6 @@ if __name__ == "__main__":
     while True:
         # Continuously perform speech recognition and print the recognized text.
         Text = speech_recognition()
+        if Text is None:
+            break
         print(Text)
@@ -1,31 +1,30 @@
 import pygame
 import random
 import asyncio
-import edge_tts
+import threading
+import queue
+import re
 import os
 from dotenv import dotenv_values
 
+from Backend.AudioCache import AudioCache
+from Backend.Tracing import tracer
+
 # Get environment variables
 env_vars = dotenv_values(".env")
 assistant_voice = env_vars.get("AssistantVoice", "en-AU-NatashaNeural")
+pitch = "+2Hz"
+rate = "+10%"
 
+# Synthesized speech is reused for repeated phrases
+audio_cache = AudioCache(max_bytes=int(env_vars.get("AudioCacheMB", 200)) * 1024 * 1024)
 
-async def text_to_audio(text: str) -> None:
-    """Convert text to audio file using edge-tts."""
-    file_path = os.path.join("Data", "speech.mp3")
-
-    # Clean up existing file
-    if os.path.exists(file_path):
-        os.remove(file_path)
 
+@tracer.traced()
+async def text_to_audio(text: str) -> str:
+    """Convert text to an audio file using edge-tts and return its path."""
     try:
-        communicate = edge_tts.Communicate(
-            text=text,
-            voice=assistant_voice,
-            pitch="+2Hz",
-            rate="+10%"
-        )
-        await communicate.save(file_path)
+        return await audio_cache.synthesize(text, assistant_voice, pitch, rate)
     except Exception as e:
         print(f"Error in text_to_audio: {e}")
         raise
@@ -34,19 +33,20 @@ async def text_to_audio(text: str) -> None:
 def tts(text: str, func=lambda r=None: True) -> bool:
     """Text to speech with pygame audio playback."""
     try:
-        # Run async text to audio conversion
-        asyncio.run(text_to_audio(text))
+        # Cache hits skip edge-tts entirely
+        file_path = audio_cache.get(text, assistant_voice, pitch, rate) or asyncio.run(text_to_audio(text))
 
         # Initialize and play audio
-        pygame.mixer.init()
-        pygame.mixer.music.load(os.path.join("Data", "speech.mp3"))
-        pygame.mixer.music.play()
-
-        # Wait for playback to complete
-        while pygame.mixer.music.get_busy():
-            if func() is False:
-                break
-            pygame.time.Clock().tick(10)
+        with tracer.span("playback"):
+            pygame.mixer.init()
+            pygame.mixer.music.load(file_path)
+            pygame.mixer.music.play()
+
+            # Wait for playback to complete
+            while pygame.mixer.music.get_busy():
+                if func() is False:
+                    break
+                pygame.time.Clock().tick(10)
         return True
 
     except Exception as e:
@@ -101,18 +101,182 @@ responses = [
 ]
 
 
+def is_long_answer(text: str) -> bool:
+    """Answers this long are cut to two sentences and a pointer to the chat window."""
+    return len(str(text).split(".")) > 4 and len(text) >= 250
+
+
 def text_to_speech(text: str, func=lambda r=None: True) -> None:
     """Process text and convert to speech with length handling."""
-    sentences = str(text).split(".")
-
     # Check if text is long enough to split
-    if len(sentences) > 4 and len(text) >= 250:
-        first_part = ". ".join(sentences[:2]) + "."
-        tts(first_part + " " + random.choice(responses), func)
+    if is_long_answer(text):
+        # SpeechStream speaks the first two sentences, then a canned redirect from the warm cache
+        speech = SpeechStream(func)
+        speech.feed(str(text))
+        speech.close()
+        speech.wait()
     else:
         tts(text, func)
 
 
+def prewarm_responses() -> threading.Thread:
+    """Synthesize every canned response into the audio cache in the background."""
+    async def warm():
+        for response in responses:
+            try:
+                await audio_cache.synthesize(response, assistant_voice, pitch, rate)
+            except Exception as e:
+                print(f"Error pre-warming speech cache: {e}")
+                return
+
+    thread = threading.Thread(target=lambda: asyncio.run(warm()), name="SpeechCacheWarmup", daemon=True)
+    thread.start()
+    return thread
+
+
+class SpeechStream:
+    """Speak an answer sentence by sentence while it is still being generated.
+
+    Tokens are fed in as they arrive. Every finished sentence is synthesized
+    on a background thread while the previous one plays, and playback queues
+    the next clip on the same mixer channel so there is no gap between them.
+    Long answers follow text_to_speech: the first two sentences are spoken,
+    followed by one of the canned responses.
+    """
+
+    _sentence_end = re.compile(r"(?<=[.!?\n])\s+")
+
+    def __init__(self, func=lambda r=None: True):
+        self.func = func
+        self._text = ""
+        self._pending = ""
+        self._spoken = 0
+        self._held = []
+        self._finished = False
+        self._cancelled = threading.Event()
+        self._synthesis = queue.Queue()
+        self._playback = queue.Queue()
+        self._done = threading.Event()
+        threading.Thread(target=tracer.bind(self._synthesize), name="SpeechSynthesis", daemon=True).start()
+        threading.Thread(target=tracer.bind(self._play), name="SpeechPlayback", daemon=True).start()
+
+    def feed(self, token: str) -> None:
+        """Add streamed text; complete sentences are scheduled for speech."""
+        if self._finished or not token:
+            return
+        self._text += token
+        self._pending += token
+        *sentences, self._pending = self._sentence_end.split(self._pending)
+        for sentence in sentences:
+            self._add_sentence(sentence)
+
+    def close(self, text: str = None) -> None:
+        """Mark the end of the answer and speak whatever is left.
+
+        text is the complete answer; it is spoken as a whole if nothing was
+        streamed, e.g. when the request failed and returned an error message.
+        """
+        if text and not self._text:
+            self.feed(text)
+        if not self._finished:
+            self._add_sentence(self._pending)
+            self._pending = ""
+            for sentence in self._held:
+                self._speak(sentence)
+            self._held = []
+            self._finished = True
+        self._synthesis.put(None)
+
+    def cancel(self) -> None:
+        """Stop speaking: drop the sentences not spoken yet and cut off the clip that is playing."""
+        self._cancelled.set()
+        self._finished = True
+        self._synthesis.put(None)
+
+    def wait(self) -> bool:
+        """Block until everything has been spoken."""
+        self._done.wait()
+        return True
+
+    def _add_sentence(self, sentence: str) -> None:
+        if self._finished or not sentence.strip():
+            return
+        if self._spoken < 2:
+            self._speak(sentence)
+        elif is_long_answer(self._text):
+            # Too long to read out: finish with a pointer to the chat window instead
+            self._held = []
+            self._speak(random.choice(responses))
+            self._finished = True
+        else:
+            # Only spoken once we know the answer stays short
+            self._held.append(sentence)
+
+    def _speak(self, sentence: str) -> None:
+        self._spoken += 1
+        self._synthesis.put(sentence.strip())
+
+    def _synthesize(self) -> None:
+        while True:
+            sentence = self._synthesis.get()
+            if sentence is None:
+                self._playback.put(None)
+                return
+            if self._cancelled.is_set():
+                continue
+            try:
+                with tracer.span("synthesize sentence", chars=len(sentence)):
+                    file_path = audio_cache.get(sentence, assistant_voice, pitch, rate) \
+                        or asyncio.run(text_to_audio(sentence))
+                self._playback.put(file_path)
+            except Exception as e:
+                print(f"Error in SpeechStream synthesis: {e}")
+
+    @tracer.traced("playback")
+    def _play(self) -> None:
+        try:
+            pygame.mixer.init()
+            channel = None
+            clock = pygame.time.Clock()
+            while True:
+                file_path = self._playback.get()
+                if file_path is None:
+                    break
+                if self._cancelled.is_set():
+                    continue
+                sound = pygame.mixer.Sound(file_path)
+                tracer.instant("clip ready")
+                if channel is None or not channel.get_busy():
+                    channel = sound.play()
+                else:
+                    # Wait for the queue slot to free up, then chain the clip for gap-free playback
+                    while channel.get_queue() is not None and channel.get_busy():
+                        if self.func() is False or self._cancelled.is_set():
+                            return
+                        clock.tick(100)
+                    if channel.get_busy():
+                        channel.queue(sound)
+                    else:
+                        channel = sound.play()
+
+            while channel is not None and channel.get_busy():
+                if self.func() is False or self._cancelled.is_set():
+                    break
+                clock.tick(10)
+
+        except Exception as e:
+            print(f"Error in SpeechStream playback: {e}")
+
+        finally:
+            try:
+                self.func(False)
+                # Quitting the mixer also stops a clip that was cut off by cancel()
+                pygame.mixer.quit()
+            except Exception as e:
+                print(f"Error in finally block: {e}")
+            self._done.set()
+
+
 if __name__ == "__main__":
     # Create Data directory if it doesn't exist
     os.makedirs("Data", exist_ok=True)
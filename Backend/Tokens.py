@@ -0,0 +1,69 @@
+from functools import lru_cache
+import math
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    """The tiktoken encoding used for counting, or None when tiktoken is not installed."""
+    # tiktoken is optional; cl100k_base is close to the Llama 3 tokenizer behind the Groq models
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """Count the tokens in text, or estimate them (about four characters per token) without tiktoken."""
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(1, math.ceil(len(text) / 4))
+
+
+def count_message_tokens(message: dict) -> int:
+    """Estimate the tokens a chat message costs, including per-message overhead."""
+    return 4 + count_tokens(str(message.get("content", message.get("message", ""))))
+
+
+def recent_messages(messages, budget: int) -> list:
+    """Return the most recent messages whose combined cost fits in budget, oldest first.
+
+    The newest message is the request being made, so it is always kept, cut
+    down with trim_to_tokens if it alone is over budget.
+    """
+    messages = list(messages)
+    if not messages:
+        return []
+    newest = messages[-1]
+    if count_message_tokens(newest) > budget:
+        key = "content" if "content" in newest else "message"
+        newest = dict(newest, **{key: trim_to_tokens(str(newest.get(key, "")), max(0, budget - 4))})
+    budget -= count_message_tokens(newest)
+    chosen = [newest]
+    for message in reversed(messages[:-1]):
+        budget -= count_message_tokens(message)
+        if budget < 0:
+            break
+        chosen.append(message)
+    return chosen[::-1]
+
+
+def trim_to_tokens(text: str, budget: int) -> str:
+    """Return the start of text that fits in budget, cut at a line or, for the last line, a word boundary."""
+    if count_tokens(text) <= budget:
+        return text
+    kept = []
+    for line in text.splitlines():
+        cost = count_tokens(line) + 1
+        if cost > budget:
+            # Cut the line that does not fit to about the room left (four characters per token)
+            if budget > 8:
+                kept.append(line[:(budget - 2) * 4].rsplit(" ", 1)[0] + " ...")
+            break
+        budget -= cost
+        kept.append(line)
+    return "\n".join(kept)
@@ -0,0 +1,193 @@
+from contextlib import contextmanager, asynccontextmanager, nullcontext
+from dotenv import dotenv_values
+import contextvars
+import functools
+import itertools
+import threading
+import inspect
+import json
+import time
+import sys
+import os
+
+env_vars = dotenv_values(".env")
+
+TRACE_PATH = os.path.join("Data", "Traces.json")
+TRACE_BYTES = int(env_vars.get("TraceFileMB", 20)) * 1024 * 1024
+TRACE_BACKUPS = int(env_vars.get("TraceFiles", 3))
+
+_no_span = nullcontext()
+
+
+class Tracer:
+    """Nested timing spans per turn, written as Chrome trace events.
+
+    Every span carries the id of the turn it belongs to. Ids follow the code
+    through contextvars, so asyncio tasks and asyncio.to_thread calls inherit
+    them; threads started with bind() do too. Events are buffered and written
+    by a background thread to a file that opens in chrome://tracing or
+    ui.perfetto.dev, rotated once it reaches max_bytes.
+
+    When disabled, span() returns a shared no-op context manager and traced()
+    and bind() return the function unchanged, so instrumented code pays
+    nothing beyond the call.
+    """
+
+    def __init__(self, enabled=False, path=TRACE_PATH, max_bytes=TRACE_BYTES, backups=TRACE_BACKUPS):
+        self.enabled = enabled
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.last_trace = None
+        self._trace = contextvars.ContextVar("trace", default=None)
+        self._turns = itertools.count(1)
+        self._ids = itertools.count(1)
+        self._pending = []
+        self._named_threads = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        if enabled:
+            threading.Thread(target=self._run, name="TraceWriter", daemon=True).start()
+
+    def current_trace(self):
+        """Id of the turn the caller is part of, or the latest turn for code outside one (e.g. the GUI)."""
+        return self._trace.get() or self.last_trace
+
+    def turn(self, name="turn", trace=None):
+        """Start a new trace id (or continue trace) for everything inside, recorded as one span."""
+        if not self.enabled:
+            return _no_span
+        return self._turn(name, trace)
+
+    @contextmanager
+    def _turn(self, name, trace):
+        if trace is None:
+            trace = f"{os.getpid()}-{next(self._turns)}"
+            self.last_trace = trace
+        with self._use(trace), self._span(name, "turn", {}):
+            yield trace
+
+    def use(self, trace):
+        """Run the enclosed block as part of an existing trace, e.g. work queued by an earlier turn."""
+        if not self.enabled:
+            return _no_span
+        return self._use(trace)
+
+    @contextmanager
+    def _use(self, trace):
+        token = self._trace.set(trace)
+        try:
+            yield trace
+        finally:
+            self._trace.reset(token)
+
+    def span(self, name: str, cat="stage", **args):
+        """Time the enclosed block on the current thread."""
+        if not self.enabled:
+            return _no_span
+        return self._span(name, cat, args)
+
+    @contextmanager
+    def _span(self, name, cat, args):
+        started, wall = time.perf_counter(), time.time()
+        try:
+            yield
+        finally:
+            self._event(name, cat, "X", wall, dur=(time.perf_counter() - started) * 1e6, args=args)
+
+    def async_span(self, name: str, cat="stage", **args):
+        """Time the enclosed block of a coroutine on its own track, so concurrent tasks do not overlap."""
+        if not self.enabled:
+            return _no_span
+        return self._async_span(name, cat, args)
+
+    @asynccontextmanager
+    async def _async_span(self, name, cat, args):
+        span_id = f"{self.current_trace()}.{next(self._ids)}"
+        self._event(name, cat, "b", time.time(), id=span_id, args=args)
+        try:
+            yield
+        finally:
+            self._event(name, cat, "e", time.time(), id=span_id)
+
+    def instant(self, name: str, cat="stage", **args) -> None:
+        """Record a point in time, e.g. the first streamed token."""
+        if self.enabled:
+            self._event(name, cat, "i", time.time(), s="t", args=args)
+
+    def traced(self, name=None, cat="stage"):
+        """Decorator wrapping every call of a function or coroutine function in a span."""
+        def decorate(function):
+            if not self.enabled:
+                return function
+            label = name or function.__name__
+            if inspect.iscoroutinefunction(function):
+                @functools.wraps(function)
+                async def wrapper(*args, **kwargs):
+                    async with self.async_span(label, cat):
+                        return await function(*args, **kwargs)
+            else:
+                @functools.wraps(function)
+                def wrapper(*args, **kwargs):
+                    with self.span(label, cat):
+                        return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def bind(self, function):
+        """Wrap a thread target so it runs in the caller's trace."""
+        if not self.enabled:
+            return function
+        context = contextvars.copy_context()
+        return functools.partial(context.run, function)
+
+    def _event(self, name, cat, ph, wall, args=None, **fields) -> None:
+        thread = threading.current_thread()
+        event = {"name": name, "cat": cat, "ph": ph, "ts": wall * 1e6, "pid": os.getpid(), "tid": thread.ident,
+                 "args": dict(args or {}, trace=self.current_trace()), **fields}
+        with self._lock:
+            if thread.ident not in self._named_threads:
+                self._named_threads.add(thread.ident)
+                self._pending.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": thread.ident,
+                                      "args": {"name": thread.name}})
+            self._pending.append(event)
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            with self._lock:
+                events, self._pending = self._pending, []
+            try:
+                self._write(events)
+            except Exception as e:
+                print(f"Error writing trace events: {e}")
+
+    def _write(self, events: list) -> None:
+        # JSON array format; the closing bracket is optional, so events can be appended as they come
+        chunk = ",\n".join(json.dumps(event) for event in events)
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if size and size + len(chunk) > self.max_bytes:
+            self._rotate()
+            size = 0
+            with self._lock:
+                # Thread names are metadata of the file they were written to; other threads name themselves again
+                self._named_threads = {event["tid"] for event in events if event["ph"] == "M"}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(("[\n" if not size else ",\n") + chunk)
+
+    def _rotate(self) -> None:
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write("\n]\n")
+        for number in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{number}"):
+                os.replace(f"{self.path}.{number}", f"{self.path}.{number + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+tracer = Tracer(enabled=env_vars.get("Tracing", "False") == "True" or "--trace" in sys.argv)
@@ -0,0 +1,453 @@
+"""End-to-end latency of voice turns against simulated providers.
+
+    python -m Benchmarks.TurnLatency [--iterations 3] [--config latencies.json]
+                                     [--corpus Benchmarks/Corpus.json] [--output results.json]
+                                     [--compare earlier-results.json] [--seed 1] [--trace] [--speculate]
+
+Every external service (speech recognition, Cohere, Groq, googlesearch, web
+pages, edge-tts, audio playback, the Hugging Face image endpoint and the
+desktop automation libraries) is replaced by an in-process stand-in with a
+configurable latency and token streaming rate, so runs are repeatable and
+need no network or API keys. The backend itself runs unmodified in a
+temporary working directory, which starts empty: the first pass over the
+corpus is cold and later passes hit the caches like a real session would.
+"""
+from types import ModuleType, SimpleNamespace
+import multiprocessing
+import argparse
+import tempfile
+import datetime
+import threading
+import asyncio
+import random
+import json
+import time
+import sys
+import io
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Milliseconds unless noted; every latency is scaled by (1 + jitter * gauss) per call
+DEFAULT_CONFIG = {
+    "recognizer": {"latency_ms": 300, "jitter": 0.2},
+    "cohere": {"first_token_ms": 350, "tokens_per_second": 90, "jitter": 0.2},
+    "groq": {"first_token_ms": 200, "tokens_per_second": 300, "jitter": 0.2},
+    "search": {"latency_ms": 600, "jitter": 0.3},
+    "web": {"latency_ms": 250, "jitter": 0.5},
+    "image": {"latency_ms": 4000, "jitter": 0.2},
+    "tts": {"latency_ms": 300, "ms_per_char": 2, "jitter": 0.2},
+    # Real speech is about 2.5 words per second; playback is simulated faster so runs stay short
+    "playback": {"words_per_second": 25},
+    "automation": {"latency_ms": 400, "jitter": 0.3},
+}
+
+METRICS = ["decision", "first_text", "first_audio", "total", "images"]
+
+
+class TurnClock:
+    """First time each milestone is reached in the current turn, relative to its start."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.marks = {}
+
+    def start(self) -> None:
+        with self._lock:
+            self.started = time.perf_counter()
+            self.marks = {}
+
+    def mark(self, name: str) -> None:
+        with self._lock:
+            self.marks.setdefault(name, time.perf_counter() - self.started)
+
+
+class Latency:
+    def __init__(self, config: dict, rng: random.Random):
+        self.config = config
+        self.rng = rng
+        self._lock = threading.Lock()
+
+    def seconds(self, service: str, key="latency_ms", extra_ms=0.0) -> float:
+        settings = self.config[service]
+        with self._lock:
+            noise = self.rng.gauss(0, settings.get("jitter", 0.0))
+        return max(0.0, (settings.get(key, 0) + extra_ms) * (1 + noise) / 1000)
+
+    def sleep(self, service: str, key="latency_ms", extra_ms=0.0) -> None:
+        time.sleep(self.seconds(service, key, extra_ms))
+
+
+class Corpus:
+    def __init__(self, entries: list):
+        self.entries = entries
+
+    def find(self, text: str):
+        from Backend.IntentClassifier import normalize_query
+        text = normalize_query(text)
+        return next((entry for entry in self.entries if normalize_query(entry["query"]) in text), None)
+
+    def decision(self, text: str) -> str:
+        entry = self.find(text)
+        return entry["decision"] if entry else f"general {text}"
+
+    def answer(self, text: str) -> str:
+        # Answers are asked for with the task text of a decision, which may be part of a longer query
+        from Backend.IntentClassifier import normalize_query
+        text = normalize_query(text)
+        entry = next((entry for entry in self.entries if entry["answer"] and text in normalize_query(entry["decision"])),
+                     None) or self.find(text)
+        return (entry or {}).get("answer") or "Sure, here is a short answer to that. Let me know if you need more."
+
+
+def stream_tokens(text: str, latency: Latency, service: str):
+    """Yield text word by word after a first-token delay, at the configured token rate."""
+    latency.sleep(service, "first_token_ms")
+    interval = 1 / latency.config[service]["tokens_per_second"]
+    for index, word in enumerate(text.split(" ")):
+        if index:
+            time.sleep(interval)
+        yield word if index == 0 else " " + word
+
+
+def module(name: str, **attributes) -> ModuleType:
+    created = ModuleType(name)
+    created.__dict__.update(attributes)
+    sys.modules[name] = created
+    return created
+
+
+def install_stand_ins(latency: Latency, corpus: Corpus, clock: TurnClock) -> None:
+    """Register simulated providers in sys.modules before the backend imports them."""
+
+    # Cohere decision model
+    class CohereClient:
+        def __init__(self, **kwargs):
+            pass
+
+        def chat_stream(self, message, **kwargs):
+            for token in stream_tokens(corpus.decision(message), latency, "cohere"):
+                yield SimpleNamespace(event_type="text-generation", text=token)
+
+    module("cohere", Client=CohereClient)
+
+    # Groq chat completions
+    class Completions:
+        def create(self, messages, stream=False, **kwargs):
+            question = next(m["content"] for m in reversed(messages) if m["role"] == "user")
+            for token in stream_tokens(corpus.answer(question), latency, "groq"):
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+
+    class Groq:
+        def __init__(self, **kwargs):
+            self.chat = SimpleNamespace(completions=Completions())
+
+    module("groq", Groq=Groq)
+
+    def search(query, num_results=10, **kwargs):
+        latency.sleep("search")
+        slug = "-".join(query.split())
+        return [f"https://example.com/{index}/{slug}" for index in range(num_results)]
+
+    module("googlesearch", search=search)
+
+    # Text to speech and playback
+    class Communicate:
+        def __init__(self, text, voice=None, pitch=None, rate=None):
+            self.text = text
+
+        async def save(self, path):
+            await asyncio.sleep(latency.seconds("tts", extra_ms=len(self.text) * latency.config["tts"]["ms_per_char"]))
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(self.text)
+
+    module("edge_tts", Communicate=Communicate)
+
+    def clip_seconds(path):
+        with open(path, "r", encoding="utf-8") as file:
+            return len(file.read().split()) / latency.config["playback"]["words_per_second"]
+
+    class Channel:
+        def __init__(self):
+            self.ends = 0.0
+            self.queued = None
+
+        def play(self, sound):
+            clock.mark("first_audio")
+            self.ends = time.perf_counter() + sound.seconds
+            return self
+
+        def queue(self, sound):
+            self.queued = sound
+
+        def get_queue(self):
+            self._advance()
+            return self.queued
+
+        def get_busy(self):
+            self._advance()
+            return time.perf_counter() < self.ends
+
+        def _advance(self):
+            if self.queued is not None and time.perf_counter() >= self.ends:
+                self.ends += self.queued.seconds
+                self.queued = None
+
+    class Sound:
+        def __init__(self, path):
+            self.seconds = clip_seconds(path)
+
+        def play(self):
+            return Channel().play(self)
+
+    class Music:
+        ends = 0.0
+
+        def load(self, path):
+            self.seconds = clip_seconds(path)
+
+        def play(self):
+            clock.mark("first_audio")
+            self.ends = time.perf_counter() + self.seconds
+
+        def get_busy(self):
+            return time.perf_counter() < self.ends
+
+        def stop(self):
+            self.ends = 0.0
+
+    class Clock:
+        def tick(self, framerate=0):
+            time.sleep(1 / framerate if framerate else 0)
+
+    mixer = SimpleNamespace(init=lambda *a, **k: None, quit=lambda: None, music=Music(), Sound=Sound)
+    module("pygame", mixer=mixer, time=SimpleNamespace(Clock=Clock))
+
+    # Browser speech recognition is replaced by SimulatedRecognizer; these only satisfy imports
+    class ChromeOptions:
+        def add_argument(self, argument):
+            pass
+
+    class Unused(Exception):
+        pass
+
+    module("selenium", webdriver=module("selenium.webdriver", Chrome=None))
+    module("selenium.webdriver.common")
+    module("selenium.webdriver.common.by", By=None)
+    module("selenium.common")
+    module("selenium.common.exceptions", TimeoutException=Unused, JavascriptException=Unused,
+           SessionNotCreatedException=Unused)
+    module("selenium.webdriver.chrome")
+    module("selenium.webdriver.chrome.service", Service=None)
+    module("selenium.webdriver.chrome.options", Options=ChromeOptions)
+    module("webdriver_manager")
+    module("webdriver_manager.chrome", ChromeDriverManager=None)
+    module("mtranslate", translate=lambda text, *args: text)
+
+    # Desktop automation
+    def automation(*args, **kwargs):
+        latency.sleep("automation")
+        return True
+
+    module("AppOpener", open=automation, close=automation,
+           give_appnames=lambda: ["google chrome", "spotify", "visual studio code"])
+    module("pywhatkit", search=automation, playonyt=automation)
+    module("keyboard", press_and_release=automation)
+
+
+class SimulatedResponse:
+    def __init__(self, status_code=200, content=b"", content_type="text/html; charset=utf-8"):
+        self.status_code = status_code
+        self.content = content
+        self.text = content.decode("utf-8", errors="replace")
+        self.headers = {"Content-Type": content_type}
+        self.encoding = "utf-8"
+
+    def iter_content(self, size):
+        for start in range(0, len(self.content), size):
+            yield self.content[start:start + size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class SimulatedSession:
+    """Stands in for the shared requests session: web pages and the image endpoint."""
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new("RGB", (512, 512), (180, 90, 40)).save(buffer, "JPEG")
+        self.image = buffer.getvalue()
+
+    def get(self, url, **kwargs):
+        self.latency.sleep("web")
+        topic = url.rsplit("/", 1)[-1].replace("-", " ")
+        paragraph = f"<p>Here is a detailed paragraph about {topic} with enough words to count as content.</p>"
+        return SimulatedResponse(content=f"<html><body>{paragraph * 5}</body></html>".encode("utf-8"))
+
+    def post(self, url, **kwargs):
+        self.latency.sleep("image")
+        return SimulatedResponse(content=self.image, content_type="image/jpeg")
+
+    def head(self, url, **kwargs):
+        return SimulatedResponse()
+
+
+def percentile(values: list, fraction: float):
+    """Nearest-rank percentile, or None without samples."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+def summarize(turns: list) -> dict:
+    summary = {}
+    for metric in METRICS:
+        values = [turn[metric] for turn in turns if turn.get(metric) is not None]
+        summary[metric] = {"count": len(values), "p50": percentile(values, 0.50),
+                           "p95": percentile(values, 0.95), "p99": percentile(values, 0.99)}
+    return summary
+
+
+def print_summary(summary: dict, baseline: dict = None) -> None:
+    width = 18 if baseline else 10
+    print(f"{'metric':<14}{'count':>7}" + "".join(f"{key + ' ms':>{width}}" for key in ("p50", "p95", "p99")))
+    for metric, values in summary.items():
+        cells = []
+        for key in ("p50", "p95", "p99"):
+            value = values[key]
+            cell = "-" if value is None else f"{value * 1000:.0f}"
+            old = (baseline or {}).get(metric, {}).get(key)
+            if value is not None and old:
+                cell += f" ({(value - old) / old:+.0%})"
+            cells.append(cell)
+        print(f"{metric:<14}{values['count']:>7}" + "".join(f"{cell:>{width}}" for cell in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure voice turn latency against simulated providers.")
+    parser.add_argument("--iterations", type=int, default=3, help="passes over the corpus")
+    parser.add_argument("--config", help="JSON file overriding DEFAULT_CONFIG entries")
+    parser.add_argument("--corpus", default=os.path.join(ROOT, "Benchmarks", "Corpus.json"))
+    parser.add_argument("--output", help="where to save the results (default Benchmarks/Results/<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to show relative changes against")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--trace", action="store_true", help="also record per-turn tracing spans (Backend.Tracing)")
+    parser.add_argument("--speculate", action="store_true",
+                        help="start likely answers before the decision (Backend.Speculation)")
+    args = parser.parse_args()
+
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as file:
+            for service, settings in json.load(file).items():
+                config.setdefault(service, {}).update(settings)
+    with open(args.corpus, "r", encoding="utf-8") as file:
+        corpus = Corpus(json.load(file))
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)["summary"]
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    output = os.path.abspath(args.output or os.path.join(ROOT, "Benchmarks", "Results", f"{stamp}.json"))
+
+    # Modules read .env from the working directory or, through load_dotenv, from the process
+    # environment, which takes precedence over the repository's own .env
+    settings = {"Username": "Benchmark", "USERNAME": "Benchmark", "Assistantname": "Friday", "GROQ_API_KEY": "simulated",
+                "CohereAPIkey": "simulated", "HuggingFaceAPIKey": "simulated", "InputLanguage": "en"}
+    if args.speculate:
+        settings["Speculation"] = "True"
+    workdir = tempfile.mkdtemp(prefix="friday-bench-")
+    os.makedirs(os.path.join(workdir, "Data"))
+    with open(os.path.join(workdir, ".env"), "w") as file:
+        file.write("".join(f"{key}={value}\n" for key, value in settings.items()))
+    os.environ.update(settings)
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+
+    latency = Latency(config, random.Random(args.seed))
+    clock = TurnClock()
+    install_stand_ins(latency, corpus, clock)
+
+    from Backend import Providers
+    Providers._clients["http"] = Providers._connections["http"] = SimulatedSession(latency)
+
+    from Backend.Recognizers import Recognizer
+    from Backend.EventBus import bus, IMAGE_JOB
+    from Backend.Orchestrator import TurnOrchestrator
+    from Backend.Speculation import speculator
+    from Backend import SpeechToText
+
+    queries = [entry["query"] for entry in corpus.entries] * args.iterations
+
+    class SimulatedRecognizer(Recognizer):
+        def __init__(self):
+            self.next = 0
+
+        def listen(self) -> str:
+            latency.sleep("recognizer")
+            self.next += 1
+            return queries[self.next - 1]
+
+    SpeechToText.recognizer = SimulatedRecognizer()
+    bus.subscribe(IMAGE_JOB, lambda job: job.get("state") == "done" and clock.mark("images"))
+
+    def show_text(text, seq=None, question_seq=None):
+        if text.startswith("Friday :"):
+            clock.mark("first_text")
+
+    orchestrator = TurnOrchestrator(show_text, lambda status: None, SpeechToText.QueryModifier, "Friday")
+    turns = []
+    decisions = []
+
+    def on_decision(decision):
+        clock.mark("decision")
+        decisions.append(decision)
+
+    for number, query in enumerate(queries):
+        # The same turn Main.MainExecution runs, without the window
+        clock.start()
+        orchestrator.listen_and_run("Benchmark", on_decision=on_decision)
+        clock.mark("total")
+        decision = decisions[-1]
+        if any("generate image" in task for task in decision):
+            # Image jobs finish in the background; wait so the next turn starts from a quiet state
+            bus.wait_for(IMAGE_JOB, lambda job: job.get("state") in ("done", "failed", "cancelled"), timeout=60)
+            time.sleep(0.05)
+        turns.append(dict(clock.marks, query=query, iteration=number // len(corpus.entries), tasks=decision))
+        print(f"{turns[-1]['total'] * 1000:8.0f} ms  {query}")
+
+    summary = summarize(turns)
+    print()
+    print_summary(summary, baseline)
+    speculation = speculator.stats() if speculator.enabled else None
+    if speculation:
+        print(f"\nSpeculation: {speculation['hits']} hits, {speculation['misses']} misses, "
+              f"{speculation['skipped']} skipped, hit rate {speculation['hit_rate']:.0%}, "
+              f"head start {speculation['head_start'] * 1000:.0f} ms, "
+              f"wasted {speculation['wasted_tokens']} tokens and {speculation['wasted_searches']} searches")
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump({"started": stamp, "config": config, "corpus": args.corpus, "iterations": args.iterations,
+                   "seed": args.seed, "summary": summary, "speculation": speculation, "turns": turns},
+                  file, indent=2)
+    print(f"\nSaved to {output}")
+    if args.trace:
+        time.sleep(0.2)  # Let the trace writer catch up
+        print(f"Trace events in {os.path.join(workdir, 'Data', 'Traces.json')}")
+    # Worker threads need no orderly shutdown, but thumbnail processes would keep stdout open
+    for child in multiprocessing.active_children():
+        child.terminate()
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,23 @@
-from Frontend.GUI import (
-    GraphicalUserInterface,
-    SetAssistantStatus,
-    ShowTextToScreen,
-    TempDirectoryPath,
-    SetMicrophoneStatus,
-    AnswerModifier,
-    QueryModifier,
-    GetMicrophoneStatus,
-    GetAssistantStatus
-)
-from Backend.Model import FirstlayerDMM
-from Backend.RealtimeSearchEngine import realtime_search_engine
-from Backend.Automation import Automation
-from Backend.SpeechToText import speech_recognition
-from Backend.Chatbox import chatbot
-from Backend.TextToSpeech import text_to_speech
+from Backend.Boot import profiler
+
+# Only the window is imported up front; the backend loads while it is shown
+with profiler.span("Frontend.GUI", kind="import"):
+    from Frontend.GUI import (
+        GraphicalUserInterface,
+        SetAssistantStatus,
+        ShowTextToScreen,
+        TempDirectoryPath,
+        SetMicrophoneStatus,
+        AnswerModifier,
+        QueryModifier,
+        GetMicrophoneStatus,
+        GetAssistantStatus,
+        WaitForMicrophoneStatus
+    )
+from Backend.ChatStore import get_chat_store
 from dotenv import dotenv_values
-from asyncio import run
-from time import sleep
-import subprocess
 import threading
-import json
+import traceback
 import os
 
 env_vars = dotenv_values(".env")
@@ -28,153 +25,82 @@ Username = env_vars.get("Username")
 Assistantname = env_vars.get("Assistantname")
 DefaultMessage = f'''{Username} : Hello {Assistantname}, How are you?
 {Assistantname} : Welcome {Username}. I am doing well. How may i help you?'''
-subprocesses = []
-Functions = ["open", "close", "play", "system", "content", "google search", "youtube search"]
-
-
-def ShowDefaultChatsIfNoChats():
-    File = open(r'C:\Users\himan\Desktop\Friday\Backend\Data\ChatLog.json', "r", encoding='utf-8')
-    if len(File.read()) < 5:
-        with open(TempDirectoryPath('Database.data'), 'w', encoding='utf-8') as file:
-            file.write("")
-
-        with open(TempDirectoryPath('Responses.data'), 'w', encoding='utf-8') as file:
-            file.write(DefaultMessage)
-
+Orchestrator = None
+BackendReady = threading.Event()
 
-def ReadChatLogJson():
-    with open(r'C:\Users\himan\Desktop\Friday\Backend\Data\ChatLog.json', 'r', encoding='utf-8') as file:
-        chatlog_data = json.load(file)
-    return chatlog_data
+# Imported in this order by LoadBackend; each one is timed for --boot-profile
+BackendModules = ["Backend.Providers", "Backend.TextToSpeech", "Backend.Model",
+                  "Backend.SpeechToText", "Backend.Speculation", "Backend.Orchestrator"]
 
 
-def ChatLogIntegration():
-    json_data = ReadChatLogJson()
-    formatted_chatlog = ""
-    for entry in json_data:
-        if entry["role"] == "user":
-            formatted_chatlog += f"User: {entry['content']}\n"
-        elif entry["role"] == "assistant":
-            formatted_chatlog += f"Assistant: {entry['content']}\n"
-    formatted_chatlog = formatted_chatlog.replace("User", Username + " ")
-    formatted_chatlog = formatted_chatlog.replace("Assistant", Assistantname + " ")
-
-    with open(TempDirectoryPath('Database.data'), 'w', encoding='utf-8') as file:
-        file.write(AnswerModifier(formatted_chatlog))
-
-
-def ShowChatsOnGUI():
-    File = open(TempDirectoryPath('Database.data'), "r", encoding='utf-8')
-    Data = File.read()
-    if len(str(Data)) > 0:
-        lines = Data.split('\n')
-        result = '\n'.join(lines)
-        File.close()
-        File = open(TempDirectoryPath('Responses.data'), "w", encoding='utf-8')
-        File.write(result)
-        File.close()
+def ShowDefaultChatsIfNoChats():
+    if len(get_chat_store()) == 0:
+        ShowTextToScreen(DefaultMessage)
 
 
 def InitialExecution():
     SetMicrophoneStatus("False")
     ShowTextToScreen("")
-    ShowDefaultChatsIfNoChats()
-    ChatLogIntegration()
-    ShowChatsOnGUI()
-
-
-InitialExecution()
-
-
-def MainExecution():
-    TaskExecution = False
-    ImageExecution = False
-    ImageGenerationQuery = ""
-
-    SetAssistantStatus("Listening...")
-    Query = speech_recognition()
-    ShowTextToScreen(f"{Username} : {Query}")
-    SetAssistantStatus("Thinking...")
-    Decision = FirstlayerDMM(Query)
-
+    # The chat window pages the stored conversation in by itself
+    with profiler.span("chat history"):
+        ShowDefaultChatsIfNoChats()
+
+
+def LoadBackend():
+    global Orchestrator
+    try:
+        for Module in BackendModules:
+            profiler.import_module(Module)
+    except SystemExit:
+        # A module gave up (e.g. a missing API key); stop the whole assistant as before
+        os._exit(1)
+    except Exception:
+        # Any other import error would leave FirstThread waiting for a backend that never comes
+        traceback.print_exc()
+        print("Error loading the backend, exiting")
+        os._exit(1)
+
+    from Backend.Orchestrator import TurnOrchestrator
+    from Backend.TextToSpeech import prewarm_responses
+    from Backend.SpeechToText import GetRecognizer
+    from Backend.Providers import warm_up
+    from Backend.Memory import get_memory_index
+
+    Orchestrator = TurnOrchestrator(ShowTextToScreen, SetAssistantStatus, QueryModifier, Assistantname)
+    BackendReady.set()
+    profiler.mark("backend ready")
+
+    # Setup runs in parallel and is not waited on by the first turn
+    Steps = [
+        profiler.run_in_background("api connections", lambda: warm_up().join()),
+        profiler.run_in_background("speech cache", lambda: prewarm_responses().join()),
+        profiler.run_in_background("speech recognizer", GetRecognizer),
+        profiler.run_in_background("memory index", get_memory_index),
+    ]
+    for Step in Steps:
+        Step.join()
+    profiler.report()
+
+
+def ShowDecision(Decision):
     print("")
     print(f"Decision : {Decision}")
     print("")
 
-    G = any([i for i in Decision if i.startswith("general")])
-    R = any([i for i in Decision if i.startswith("realtime")])
 
-    Mearged_query = " and ".join(
-        [" ".join(i.split()[1:]) for i in Decision if i.startswith("general") or i.startswith("realtime")]
-    )
+def MainExecution():
+    from Backend.Speculation import speculator
 
-    for queries in Decision:
-        if "generate " in queries:
-            ImageGenerationQuery = str(queries)
-            ImageExecution = True
-
-    for queries in Decision:
-        if TaskExecution == False:
-            if any(queries.startswith(func) for func in Functions):
-                run(Automation(list(Decision)))
-                TaskExecution = True
-
-    if ImageExecution == True:
-        with open(r"Frontend\Files\ImageGeneration.data", "w") as file:
-            file.write(f"{ImageGenerationQuery},True")
-
-        try:
-            p1 = subprocess.Popen(
-                ['python', r'Backend\ImageGenration.py'],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                stdin=subprocess.PIPE,
-                shell=False
-            )
-            subprocesses.append(p1)
-
-        except Exception as e:
-            print(f"Error starting ImageGeneration.py: {e}")
-
-    if G and R or R:
-        SetAssistantStatus("Searching ...")
-        Answer = realtime_search_engine(QueryModifier(Mearged_query))
-        ShowTextToScreen(f"{Assistantname} : {Answer}")
-        SetAssistantStatus("Answering ...")
-        text_to_speech(Answer)
-        return True
-
-    else:
-        for Queries in Decision:
-            if "general" in Queries:
-                SetAssistantStatus("Thinking ...")
-                QueryFinal = Queries.replace("general ", "")
-                Answer = chatbot(QueryModifier(QueryFinal))
-                ShowTextToScreen(f"{Assistantname} : {Answer}")
-                SetAssistantStatus("Answering ...")
-                text_to_speech(Answer)
-                return True
-
-            elif "realtime" in Queries:
-                SetAssistantStatus("Searching ...")
-                QueryFinal = Queries.replace("realtime ", "")
-                Answer = realtime_search_engine(QueryModifier(QueryFinal))
-                ShowTextToScreen(f"{Assistantname} : {Answer}")
-                SetAssistantStatus("Answering ...")
-                text_to_speech(Answer)
-                return True
-
-            elif "exit" in Queries:
-                QueryFinal = "Okay, Bye!"
-                Answer = chatbot(QueryModifier(QueryFinal))
-                ShowTextToScreen(f"{Assistantname} : {Answer}")
-                SetAssistantStatus("Answering ...")
-                text_to_speech(Answer)
-                SetAssistantStatus("Answering ...")
-                os._exit(1)
+    Running = Orchestrator.listen_and_run(Username, on_decision=ShowDecision)
+    if speculator.enabled:
+        print(f"Speculation : {speculator.stats()}")
+    if not Running:
+        os._exit(1)
+    return True
 
 
 def FirstThread():
+    BackendReady.wait()
     while True:
         CurrentStatus = GetMicrophoneStatus()
 
@@ -184,18 +110,20 @@ def FirstThread():
         else:
             AIStatus = GetAssistantStatus()
 
-            if "Available..." in AIStatus:
-                sleep(0.1)
-
-            else:
+            if "Available..." not in AIStatus:
                 SetAssistantStatus("Available...")
 
+            # Sleep until the GUI turns the microphone on
+            WaitForMicrophoneStatus("True")
+
 
 def SecondThread():
-    GraphicalUserInterface()
+    GraphicalUserInterface(on_shown=lambda: profiler.mark("window shown"))
 
 
 if __name__ == "__main__":
+    InitialExecution()
+    profiler.run_in_background("backend", LoadBackend)
     thread2 = threading.Thread(target=FirstThread, daemon=True)
     thread2.start()
     SecondThread()